@@ -0,0 +1,57 @@
+# Cold start of the API with and without an existing model artifact
+#
+#   python -m benchmarks.bench_cold_start
+#
+# Each case runs in a fresh interpreter against a throwaway SQLite file and reports
+# how long until the calculator answers and how long until /api/spam/detect is ready.
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from ml.trainer import MODEL_PATH
+
+PROBE = """
+import json, time
+start = time.perf_counter()
+from fastapi.testclient import TestClient
+import main
+with TestClient(main.app) as client:
+    client.post("/api/calc/add", json={"a": 1, "b": 2}).raise_for_status()
+    serving = time.perf_counter() - start
+    while not client.get("/health").json()["model_ready"]:
+        time.sleep(0.05)
+    model_ready = time.perf_counter() - start
+print(json.dumps({"serving": serving, "model_ready": model_ready}))
+"""
+
+
+def run_case(model_path: str, db_path: str) -> dict:
+    env = dict(os.environ, SPAM_MODEL_PATH=model_path, DATABASE_URL=f"sqlite:///{db_path}",
+               SPAM_MODEL_POLL_SECONDS="0.1")
+    output = subprocess.run([sys.executable, "-c", PROBE], env=env, capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API cold-start time with/without a model artifact")
+    parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        existing = os.path.join(tmp, "existing.pkl")
+        shutil.copy(MODEL_PATH, existing)
+        cases = {
+            "artifact present": existing,
+            "artifact missing": os.path.join(tmp, "missing.pkl"),  # trained in the background
+        }
+        for i, (name, model_path) in enumerate(cases.items()):
+            # Fresh database per case, so no case starts with another case's tables and rows
+            result = run_case(model_path, os.path.join(tmp, f"case{i}.db"))
+            print(f"[BENCH] {name:<17} serving after {result['serving']:.2f}s | model ready after {result['model_ready']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# TfidfVectorizer (vocabulary) vs HashingVectorizer (stateless) pipelines, side by side
+#
+#   python -m benchmarks.bench_hashing_variant --buckets 4096 65536 262144 1048576
+#
+# Every variant is fitted on the same train split and scored on the same held-out
+# split as train_and_save_model. Artifacts go to a temporary directory, so the
+# served model is never touched. Load time is joblib.load with sklearn already
+# imported (median of --loads runs); latency is SpamScorer on one message at a time.
+import argparse
+import os
+import tempfile
+import time
+
+import joblib
+import numpy as np
+
+from ml.scorer import SpamScorer
+from ml.trainer import build_pipeline, load_split, save_model
+
+
+def bench_variant(name: str, pipeline, split, tmp: str, loads: int, messages: int) -> dict:
+    X_train, X_test, y_train, y_test = split
+    pipeline.fit(X_train, y_train)
+    accuracy = float((pipeline.predict(X_test) == y_test.to_numpy()).mean())
+
+    path = os.path.join(tmp, f"{name}.pkl")
+    save_model(pipeline, path)
+
+    load_times = []
+    for _ in range(loads):
+        start = time.perf_counter()
+        loaded = joblib.load(path)
+        load_times.append(time.perf_counter() - start)
+
+    scorer = SpamScorer(loaded)
+    texts = X_test.tolist()[:messages]
+    scorer.score([texts[0]])
+    latencies = []
+    for text in texts:
+        start = time.perf_counter()
+        scorer.score([text])
+        latencies.append(time.perf_counter() - start)
+
+    return {
+        "variant": name,
+        "accuracy": accuracy,
+        "size_kb": os.path.getsize(path) / 1024,
+        "load_ms": float(np.median(load_times)) * 1000,
+        "p50_ms": float(np.percentile(latencies, 50)) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vocabulary vs hashing vectorizer: accuracy, size, load time, latency")
+    parser.add_argument("--buckets", type=int, nargs="+", default=[2 ** 12, 2 ** 16, 2 ** 18, 2 ** 20])
+    parser.add_argument("--loads", type=int, default=5)
+    parser.add_argument("--messages", type=int, default=1000)
+    args = parser.parse_args()
+
+    split = load_split()
+    variants = [("tfidf-5000", build_pipeline("tfidf"))]
+    variants += [(f"hashing-{n}", build_pipeline("hashing", n)) for n in args.buckets]
+
+    print(f"[BENCH] {len(split[1])} held-out messages")
+    print(f"[BENCH] {'variant':<16} {'accuracy':>9} {'artifact':>11} {'load':>10} {'p50/msg':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, pipeline in variants:
+            r = bench_variant(name, pipeline, split, tmp, args.loads, args.messages)
+            print(f"[BENCH] {r['variant']:<16} {r['accuracy']:>9.4f} {r['size_kb']:>8.0f} KB "
+                  f"{r['load_ms']:>7.1f} ms {r['p50_ms']:>7.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# Load time and memory of each model artifact format
+#
+#   python -m benchmarks.bench_model_load --workers 4
+#
+# Every format is exported to a temporary directory, then loaded by N fresh
+# interpreters at once (like N uvicorn workers). Each worker reports how long
+# load_scorer took and how much RSS / private memory the load + a first scoring
+# call added, from /proc/self/smaps_rollup (Linux): pages of a memory-mapped
+# artifact are shared through the page cache, an unpickled copy is private.
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import joblib
+
+from ml.trainer import MODEL_PATH, compile_pipeline, save_model
+
+PROBE = """
+import json, sys, time
+from ml.registry import load_scorer
+
+def memory_kb():
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return fields
+
+before = memory_kb()
+start = time.perf_counter()
+scorer = load_scorer(sys.argv[1])
+load_seconds = time.perf_counter() - start
+scorer.score(["WINNER!! claim your free prize now", "see you at lunch"] * 50)
+
+print("loaded", flush=True)
+sys.stdin.readline()  # wait until all workers have loaded, so shared pages really are shared
+mem = memory_kb()
+print(json.dumps({
+    "load_ms": load_seconds * 1000,
+    "rss_kb": mem["Rss"] - before["Rss"],
+    "private_kb": mem["Private_Clean"] + mem["Private_Dirty"] - before["Private_Clean"] - before["Private_Dirty"],
+}))
+"""
+
+
+def export_formats(tmp: str) -> dict:
+    pipeline = joblib.load(MODEL_PATH)
+    scorer = compile_pipeline(pipeline)
+    paths = {
+        "pipeline": os.path.join(tmp, "pipeline.pkl"),
+        "compiled": os.path.join(tmp, "pipeline_compiled.pkl"),
+        "mmap": os.path.join(tmp, "pipeline_mmap.json"),
+    }
+    save_model(pipeline, paths["pipeline"])
+    save_model(scorer, paths["compiled"])
+    scorer.save_mmap(paths["mmap"])
+    return paths
+
+
+def run_workers(path: str, workers: int) -> list:
+    procs = [
+        subprocess.Popen([sys.executable, "-c", PROBE, path], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        for _ in range(workers)
+    ]
+    # Each worker says "loaded" and then blocks on stdin; closing it releases all of them at once
+    for proc in procs:
+        if proc.stdout.readline().strip() != "loaded":
+            raise RuntimeError(f"Probe failed for {path}")
+    for proc in procs:
+        proc.stdin.close()
+    results = []
+    for proc in procs:
+        output = proc.stdout.read()
+        if proc.wait() != 0:
+            raise RuntimeError(f"Probe failed for {path}")
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Model artifact load time and memory per worker")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = export_formats(tmp)
+        print(f"[BENCH] {args.workers} workers per format (imports excluded, memory = growth caused by the model)")
+        for name, path in paths.items():
+            results = run_workers(path, args.workers)
+            load_ms = sorted(r["load_ms"] for r in results)[len(results) // 2]
+            rss = sum(r["rss_kb"] for r in results) / len(results) / 1024
+            private = sum(r["private_kb"] for r in results) / len(results) / 1024
+            print(f"[BENCH] {name:<9} load p50: {load_ms:7.2f} ms | +RSS/worker: {rss:6.2f} MiB | +private/worker: {private:6.2f} MiB")
+
+
+if __name__ == "__main__":
+    main()
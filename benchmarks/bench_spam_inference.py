@@ -0,0 +1,63 @@
+# Per-message latency of /api/spam/detect inference: old predict + predict_proba vs SpamScorer
+# vs the compiled TF-IDF + LR scorer (float64 and quantized weights)
+#
+#   python -m benchmarks.bench_spam_inference --messages 2000
+import argparse
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from ml.compiled import QUANTIZED_DTYPES
+from ml.trainer import DATA_PATH, MODEL_PATH, compile_pipeline
+from ml.scorer import SpamScorer
+
+pipeline = joblib.load(MODEL_PATH)
+
+
+def old_path(text: str):
+    # What detect_spam used to do: the pipeline runs twice
+    prediction = pipeline.predict([text])[0]
+    probability = pipeline.predict_proba([text])[0].max()
+    return prediction, probability
+
+
+def latencies_ms(fn, texts) -> np.ndarray:
+    timings = []
+    for text in texts:
+        start = time.perf_counter()
+        fn(text)
+        timings.append((time.perf_counter() - start) * 1000)
+    return np.array(timings)
+
+
+def report(name: str, timings: np.ndarray):
+    p50, p99 = np.percentile(timings, [50, 99])
+    print(f"[BENCH] {name:<30} p50: {p50:.3f} ms | p99: {p99:.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Spam inference latency before/after")
+    parser.add_argument("--messages", type=int, default=2000)
+    args = parser.parse_args()
+
+    texts = pd.read_csv(DATA_PATH).text.sample(args.messages, replace=True, random_state=42).tolist()
+    scorer = SpamScorer(pipeline)
+    compiled = compile_pipeline(pipeline)
+
+    # Warm up both paths once
+    old_path(texts[0])
+    scorer.score([texts[0]])
+
+    print(f"[BENCH] {len(texts)} single-message calls")
+    report("predict + predict_proba", latencies_ms(old_path, texts))
+    report("SpamScorer (1x predict_proba)", latencies_ms(lambda text: scorer.score([text]), texts))
+    report("CompiledScorer", latencies_ms(lambda text: compiled.score([text]), texts))
+    for dtype in QUANTIZED_DTYPES:
+        quantized = compiled.quantize(dtype)
+        report(f"CompiledScorer ({dtype})", latencies_ms(lambda text: quantized.score([text]), texts))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# Write/read throughput of each SQLITE_PROFILES entry against a copy of calculations.db
+#
+#   python -m benchmarks.bench_sqlite_profiles --writes 2000 --reads 2000
+#
+# Each profile gets its own copy of the database, so the real file is never touched
+# and one profile's journal mode cannot leak into the next run.
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from sqlmodel import SQLModel
+
+from database import SQLITE_PROFILES, make_engine
+from calc_store import new_row, insert_calculation, history_page_query
+
+SOURCE_DB = "calculations.db"
+
+
+def bench_profile(profile: str, writes: int, reads: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "calculations.db")
+        if os.path.exists(SOURCE_DB):
+            shutil.copy(SOURCE_DB, db_path)
+        engine = make_engine(f"sqlite:///{db_path}", profile)
+        SQLModel.metadata.create_all(engine)
+
+        # Writes: one transaction per row, like /api/calc/add
+        start = time.perf_counter()
+        for i in range(writes):
+            with engine.begin() as conn:
+                insert_calculation(conn, new_row(i, i, None))
+        write_seconds = time.perf_counter() - start
+
+        # Reads: first history page, like /api/history
+        stmt = history_page_query(50)
+        start = time.perf_counter()
+        with engine.connect() as conn:
+            for _ in range(reads):
+                conn.execute(stmt).all()
+        read_seconds = time.perf_counter() - start
+
+        engine.dispose()
+
+    return {
+        "profile": profile,
+        "writes/s": round(writes / write_seconds),
+        "reads/s": round(reads / read_seconds),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite profile write/read throughput")
+    parser.add_argument("--writes", type=int, default=2000)
+    parser.add_argument("--reads", type=int, default=2000)
+    parser.add_argument("--profiles", nargs="*", default=list(SQLITE_PROFILES))
+    args = parser.parse_args()
+
+    print(f"[BENCH] {args.writes} single-row commits and {args.reads} history reads per profile")
+    for profile in args.profiles:
+        result = bench_profile(profile, args.writes, args.reads)
+        print(f"[BENCH] {result['profile']:<12} writes/s: {result['writes/s']:>7} | reads/s: {result['reads/s']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+import base64
+import csv
+import io
+import json
+import os
+import time
+from datetime import datetime
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+
+from sqlalchemy import func, insert, tuple_, update
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.compiler import InsertmanyvaluesSentinelOpts
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import IntegrityError
+
+from sqlmodel import select
+
+from database import engine, async_engine
+from models import Calculation, CalculationCounter
+
+calc_table = Calculation.__table__
+counter_table = CalculationCounter.__table__
+
+# Rows fetched per round trip by the streaming export
+EXPORT_BATCH_ROWS = int(os.getenv("CALC_EXPORT_BATCH_ROWS", "5000"))
+
+# How long a worker may reuse the last total it saw before reading the counter row again.
+# 0 = always read (exact across all uvicorn workers).
+COUNT_CACHE_SECONDS = float(os.getenv("CALC_COUNT_CACHE_SECONDS", "0"))
+
+_cached_total: Optional[int] = None
+_cached_at = 0.0
+
+
+def _remember(total: int) -> int:
+    global _cached_total, _cached_at
+    _cached_total, _cached_at = total, time.monotonic()
+    return total
+
+
+def new_row(a: int, b: int, name: Optional[str]) -> dict:
+    # The timestamp is assigned when the calculation is accepted, not when it is written
+    return {"a": a, "b": b, "result": a + b, "name": name, "timestamp": datetime.utcnow()}
+
+
+def insert_calculation(conn: Connection, row: dict) -> Tuple[int, datetime]:
+    # Core INSERT ... RETURNING id, timestamp: one round trip, no ORM object, no refresh SELECT
+    # (SQLite 3.35+ and PostgreSQL). Other backends fall back to the driver's lastrowid.
+    if conn.dialect.insert_returning:
+        stmt = insert(calc_table).returning(calc_table.c.id, calc_table.c.timestamp)
+        calc_id, timestamp = conn.execute(stmt, row).one()
+        return calc_id, timestamp
+    result = conn.execute(insert(calc_table), row)
+    return result.inserted_primary_key[0], row["timestamp"]
+
+
+def insert_calculations(conn: Connection, rows: List[dict]) -> List[int]:
+    # One executemany-style INSERT ... RETURNING id, which SQLAlchemy sends as
+    # multi-VALUES statements (insertmanyvalues_page_size rows each) -> ids in input order
+    dialect = conn.dialect
+    if not dialect.insert_executemany_returning:
+        return [insert_calculation(conn, row)[0] for row in rows]
+    if dialect.insertmanyvalues_implicit_sentinel & InsertmanyvaluesSentinelOpts.ANY_AUTOINCREMENT:
+        stmt = insert(calc_table).returning(calc_table.c.id, sort_by_parameter_order=True)
+        return list(conn.execute(stmt, rows).scalars())
+    # No implicit sentinel (SQLite): sort_by_parameter_order would make SQLAlchemy fall
+    # back to one INSERT per row. SQLite hands out rowids in VALUES order under its
+    # single-writer lock, so the sorted ids line up with the input rows.
+    stmt = insert(calc_table).returning(calc_table.c.id)
+    return sorted(conn.execute(stmt, rows).scalars())
+
+
+def save_calculation(conn: Connection, row: dict) -> Tuple[int, datetime, int]:
+    # Insert one row and bump the counter in the caller's transaction -> (id, timestamp, history_count)
+    calc_id, timestamp = insert_calculation(conn, row)
+    return calc_id, timestamp, bump_count(conn, 1)
+
+
+def encode_cursor(timestamp: datetime, calc_id: int) -> str:
+    # Opaque token for "continue after this row"
+    raw = json.dumps([timestamp.isoformat(), calc_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    # Raises ValueError for anything that is not a token we handed out
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, calc_id = json.loads(raw)
+        return datetime.fromisoformat(timestamp), int(calc_id)
+    except (TypeError, ValueError) as exc:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from exc
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+# Built once and reused: rows go straight from tuples to JSON bytes
+_encoder = json.JSONEncoder(separators=(",", ":"), default=_json_default)
+
+HISTORY_FIELDS = tuple(calc_table.c.keys())  # id, a, b, result, name, timestamp
+
+
+def parse_fields(fields: Optional[str]) -> Tuple[str, ...]:
+    # "?fields=id,result" -> ("id", "result"); no value -> every column
+    if not fields:
+        return HISTORY_FIELDS
+    names = tuple(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in names if name not in HISTORY_FIELDS]
+    if unknown or not names:
+        raise ValueError(f"Unknown fields {unknown}, choose from {list(HISTORY_FIELDS)}")
+    return names
+
+
+def history_page_query(limit: int, cursor: Optional[str] = None, fields: Tuple[str, ...] = HISTORY_FIELDS) -> Select:
+    # Keyset pagination: WHERE (timestamp, id) < (cursor) walks the (timestamp DESC, id DESC)
+    # index, so page N costs the same as page 1. Fetches limit + 1 rows to detect a next page.
+    # Only the requested columns are selected (plus timestamp/id at the end for the cursor),
+    # so rows come back as plain tuples with no ORM objects to build.
+    extra = [name for name in ("timestamp", "id") if name not in fields]
+    stmt = (
+        select(*(calc_table.c[name] for name in (*fields, *extra)))
+        .order_by(calc_table.c.timestamp.desc(), calc_table.c.id.desc())
+    )
+    if cursor:
+        timestamp, calc_id = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(calc_table.c.timestamp, calc_table.c.id) < tuple_(timestamp, calc_id))
+    return stmt.limit(limit + 1)
+
+
+def history_page_json(rows: list, limit: int, fields: Tuple[str, ...] = HISTORY_FIELDS) -> bytes:
+    items = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = encode_cursor(last.timestamp, last.id)
+    # zip() stops at len(fields), which drops the extra cursor columns
+    page = {"items": [dict(zip(fields, row)) for row in items], "next_cursor": next_cursor}
+    return _encoder.encode(page).encode()
+
+
+def export_query(start: Optional[datetime] = None, end: Optional[datetime] = None) -> Select:
+    # Oldest first; start is inclusive, end is exclusive
+    stmt = select(*calc_table.c).order_by(calc_table.c.timestamp, calc_table.c.id)
+    if start is not None:
+        stmt = stmt.where(calc_table.c.timestamp >= start)
+    if end is not None:
+        stmt = stmt.where(calc_table.c.timestamp < end)
+    return stmt
+
+
+def _format_rows(fmt: str, rows) -> str:
+    if fmt == "csv":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(
+            [value.isoformat() if isinstance(value, datetime) else value for value in row] for row in rows
+        )
+        return buffer.getvalue()
+    return "".join(_encoder.encode(dict(zip(HISTORY_FIELDS, row))) + "\n" for row in rows)
+
+
+def _csv_header() -> str:
+    return ",".join(HISTORY_FIELDS) + "\r\n"
+
+
+def export_rows(fmt: str, start: Optional[datetime] = None, end: Optional[datetime] = None) -> Iterator[str]:
+    # Server-side cursor: rows arrive EXPORT_BATCH_ROWS at a time and each batch is
+    # written out before the next one is fetched, so memory does not grow with the table
+    if fmt == "csv":
+        yield _csv_header()
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=EXPORT_BATCH_ROWS).execute(
+            export_query(start, end)
+        )
+        for rows in result.partitions():
+            yield _format_rows(fmt, rows)
+
+
+async def export_rows_async(fmt: str, start: Optional[datetime] = None, end: Optional[datetime] = None) -> AsyncIterator[str]:
+    if fmt == "csv":
+        yield _csv_header()
+    async with async_engine.connect() as conn:
+        result = await conn.stream(export_query(start, end).execution_options(yield_per=EXPORT_BATCH_ROWS))
+        async for rows in result.partitions():
+            yield _format_rows(fmt, rows)
+
+
+def init_counter():
+    # Seed the counter once from COUNT(*) (the only full scan we ever do)
+    try:
+        with engine.begin() as conn:
+            if conn.execute(select(counter_table.c.total).where(counter_table.c.id == 1)).first():
+                return
+            total = conn.execute(select(func.count()).select_from(calc_table)).scalar_one()
+            conn.execute(counter_table.insert().values(id=1, total=total))
+    except IntegrityError:
+        pass  # another worker seeded it first
+
+
+def bump_count(conn: Connection, n: int = 1) -> int:
+    # Must run inside the transaction that inserts the n rows; returns the new total.
+    # The UPDATE row-locks the counter, so concurrent workers never lose increments.
+    stmt = update(counter_table).where(counter_table.c.id == 1).values(total=counter_table.c.total + n)
+    if conn.dialect.update_returning:
+        return _remember(conn.execute(stmt.returning(counter_table.c.total)).scalar_one())
+    conn.execute(stmt)
+    return _remember(conn.execute(select(counter_table.c.total).where(counter_table.c.id == 1)).scalar_one())
+
+
+def read_count(conn: Connection) -> int:
+    if _cached_total is not None and time.monotonic() - _cached_at < COUNT_CACHE_SECONDS:
+        return _cached_total
+    total = conn.execute(select(counter_table.c.total).where(counter_table.c.id == 1)).scalar_one()
+    return _remember(total)
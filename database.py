@@ -1,6 +1,11 @@
 import os
+import threading
+import time
 from sqlmodel import SQLModel, create_engine, Session, select
-from sqlalchemy import func
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import func, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 
 # Auto-switch: local = SQLite, Render = PostgreSQL
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./calculations.db")
@@ -9,11 +14,167 @@ DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./calculations.db")
 if DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql+psycopg2://", 1)
 
-engine = create_engine(DATABASE_URL, echo=False)  # echo=True if you want logs
+# SQLite PRAGMAs applied to every new connection, picked with SQLITE_PROFILE
+SQLITE_PROFILES = {
+    "default": {},  # SQLite's own settings: rollback journal, synchronous=FULL, no mmap
+    "performance": {
+        "journal_mode": "WAL",      # readers don't block the writer
+        "synchronous": "NORMAL",    # fsync at checkpoints, not every commit (safe with WAL)
+        "mmap_size": 268435456,     # 256 MB memory-mapped reads
+        "cache_size": -65536,       # 64 MB page cache (negative = KiB)
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,       # ms to wait for a lock instead of failing right away
+    },
+}
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "default")
+
+
+def apply_sqlite_profile(sync_engine, profile: str = SQLITE_PROFILE):
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown SQLITE_PROFILE {profile!r}, expected one of {list(SQLITE_PROFILES)}")
+    pragmas = SQLITE_PROFILES[profile]
+    if sync_engine.dialect.name != "sqlite" or not pragmas:
+        return
+
+    @event.listens_for(sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+# Connection pool sizing (defaults = SQLAlchemy's own). Applies to every worker process,
+# so the most connections one worker can open is DB_POOL_SIZE + DB_MAX_OVERFLOW.
+POOL_SETTINGS = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+    "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),   # seconds to wait for a free connection
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "-1")),     # seconds before reconnecting, -1 = never
+    "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "0") == "1",  # test connections on checkout
+}
+
+
+class PoolMetrics:
+    # Counts how long requests waited to get a connection out of the pool
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.acquired += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def snapshot(self, pool) -> dict:
+        with self._lock:
+            waits = self.acquired + self.timeouts
+            return {
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "overflow_in_use": max(pool.overflow(), 0),
+                "acquired": self.acquired,
+                "timeouts": self.timeouts,
+                "wait_avg_ms": round(self.wait_total / waits * 1000, 3) if waits else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 3),
+            }
+
+
+class _TimedPoolMixin:
+    # Wraps the pool's "get a connection" step to time the wait
+    metrics: PoolMetrics
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.metrics.record(time.perf_counter() - start)
+        return connection
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    metrics = PoolMetrics()
+
+
+class TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    metrics = PoolMetrics()
+
+
+def _pool_kwargs(url: str, poolclass) -> dict:
+    # In-memory SQLite keeps one connection per thread, a sized queue pool makes no sense there
+    if url.startswith("sqlite") and (":memory:" in url or url.rstrip("/").endswith("sqlite:")):
+        return {}
+    return {"poolclass": poolclass, **POOL_SETTINGS}
+
+
+def make_engine(url: str = DATABASE_URL, profile: str = SQLITE_PROFILE):
+    new_engine = create_engine(url, echo=False, **_pool_kwargs(url, TimedQueuePool))  # echo=True if you want logs
+    apply_sqlite_profile(new_engine, profile)
+    return new_engine
+
+
+engine = make_engine()
+
+# "sync" = Session handlers run in FastAPI's threadpool (default)
+# "async" = AsyncSession handlers on aiosqlite (local) / asyncpg (PostgreSQL)
+DB_MODE = os.getenv("DB_MODE", "sync")
+
+
+def to_async_url(url: str) -> str:
+    # Same database, async driver
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    if url.startswith("postgresql+psycopg2://"):
+        return url.replace("postgresql+psycopg2://", "postgresql+asyncpg://", 1)
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    return url
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", to_async_url(DATABASE_URL))
+
+# Only built in async mode, so the sync setup does not need aiosqlite/asyncpg installed
+async_engine = None
+if DB_MODE == "async":
+    from sqlalchemy.ext.asyncio import create_async_engine
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL, echo=False, **_pool_kwargs(ASYNC_DATABASE_URL, TimedAsyncQueuePool)
+    )
+    apply_sqlite_profile(async_engine.sync_engine)
+
+def pool_status() -> dict:
+    # Live pool numbers for this worker process
+    status = {"pid": os.getpid(), "settings": POOL_SETTINGS}
+    if isinstance(engine.pool, TimedQueuePool):
+        status["sync"] = engine.pool.metrics.snapshot(engine.pool)
+    if async_engine is not None and isinstance(async_engine.pool, TimedAsyncQueuePool):
+        status["async"] = async_engine.pool.metrics.snapshot(async_engine.pool)
+    return status
+
 
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
+    # create_all skips tables that already exist, so add indexes introduced later by hand
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
 
 def get_session():
     with Session(engine) as session:
-        yield session
\ No newline at end of file
+        yield session
+
+
+async def get_async_session():
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
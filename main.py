@@ -1,18 +1,39 @@
-from fastapi import FastAPI, Depends
-from pydantic import BaseModel
-from typing import Optional, Annotated
-from database import create_db_and_tables, get_session
-from models import Calculation
-from sqlmodel import select, Session
-from sqlalchemy import func
+from fastapi import FastAPI, Depends, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, ValidationError
+from typing import Optional, Annotated, List, Tuple
+from database import create_db_and_tables, get_session, get_async_session, engine, DB_MODE, pool_status
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from datetime import datetime
 
 from fastapi import HTTPException
 from pydantic import BaseModel, Field
 from typing import Literal
 import joblib
+import json
 import os
-from ml.trainer import pipeline
+from ml.trainer import (
+    MODEL_PATH, COMPILED_PATH, MMAP_PATH, QUANTIZED_PATH, HASHING_MODEL_PATH, STREAMING_MODEL_PATH,
+    train_and_save_model, train_streaming, export_compiled_scorer, export_mmap_scorer, export_quantized_scorers,
+)
+from ml.scorer import CHUNK_SIZE
+from ml.registry import ModelRegistry
+from ml.compiled import QUANTIZED_DTYPES
+from ml.batcher import MicroBatcher, BATCHING
+from ml.executor import InferenceExecutor
+from ml.cache import PredictionCache, cache_key
+from ml.online import OnlineLearner, ONLINE_LEARNING
+from ml.retrain import Retrainer
+from calc_store import (
+    init_counter, bump_count, read_count, new_row, insert_calculations, save_calculation,
+    history_page_query, history_page_json, parse_fields, export_rows, export_rows_async,
+)
+from write_behind import write_behind, WRITE_MODE, DURABILITY
+
+# Rows per INSERT/commit for the streaming batch endpoint
+BATCH_CHUNK_ROWS = int(os.getenv("CALC_BATCH_CHUNK_ROWS", "5000"))
 
 
 app = FastAPI(
@@ -28,8 +49,28 @@ class AddRequest(BaseModel):
 
 
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
     create_db_and_tables()
+    init_counter()
+    if WRITE_MODE == "write_behind":
+        await write_behind.start()
+    model_registry.start()
+    spam_executor.start()
+    if BATCHING:
+        await spam_batcher.start()
+    if ONLINE_LEARNING:
+        await online_learner.start()
+    retrainer.start()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await write_behind.stop()  # flush rows that are still queued
+    await online_learner.stop()  # apply feedback that is still queued
+    retrainer.stop()
+    await spam_batcher.stop()
+    spam_executor.stop()
+    model_registry.stop()
 
 
 @app.get("/")
@@ -41,59 +82,360 @@ async def home():
     }
 
 
-@app.post("/api/calc/add")
-async def calc_add(request: AddRequest, session: Annotated[Session, Depends(get_session)]):
-    result = request.a + request.b
+def _add_response(request: AddRequest, history_count: int, calc_id: Optional[int], timestamp: datetime):
+    greeting = f", {request.name}" if request.name else ""
 
-    calc = Calculation(a=request.a, b=request.b, result=result, name=request.name)
-    session.add(calc)
+    return {
+        "result": request.a + request.b,
+        "operation": f"{request.a} + {request.b}",
+        "history_count": history_count,
+        "message": f"Calculation saved forever{greeting}!",
+        "id": calc_id,  # None when CALC_DURABILITY=none (row is still queued)
+        "timestamp": timestamp.isoformat()
+    }
+
+
+# Sync version: plain `def`, so FastAPI runs it in the threadpool and the blocking
+# commit never stalls the event loop
+def calc_add(request: AddRequest, session: Annotated[Session, Depends(get_session)]):
+    # INSERT ... RETURNING + counter bump in one transaction, no ORM object / refresh
+    row = new_row(request.a, request.b, request.name)
+    calc_id, timestamp, history_count = save_calculation(session.connection(), row)
     session.commit()
-    session.refresh(calc)
+    return _add_response(request, history_count, calc_id, timestamp)
 
-    # Count total calculations
-    history_count = session.exec(select(func.count()).select_from(Calculation)).one()
 
-    greeting = f", {request.name}" if request.name else ""
+# Async version: same logic on an AsyncSession (DB_MODE=async)
+async def calc_add_async(request: AddRequest, session: Annotated[AsyncSession, Depends(get_async_session)]):
+    row = new_row(request.a, request.b, request.name)
+    conn = await session.connection()
+    calc_id, timestamp, history_count = await conn.run_sync(save_calculation, row)
+    await session.commit()
+    return _add_response(request, history_count, calc_id, timestamp)
+
+
+def _read_count() -> int:
+    with engine.connect() as conn:
+        return read_count(conn)
+
+
+# Write-behind version (CALC_WRITE_MODE=write_behind, any DB_MODE): native `async def`,
+# so a request waiting for its group commit holds no threadpool thread. As a sync
+# handler every waiter would pin one of anyio's 40 threads, capping groups at 40 rows
+# and starving the other sync endpoints.
+async def calc_add_write_behind(request: AddRequest):
+    # Queue the row; the background flusher commits it together with its neighbours
+    row = new_row(request.a, request.b, request.name)
+    if DURABILITY == "group":
+        calc_id, history_count = await write_behind.submit(row)
+    else:
+        await write_behind.submit(row, wait=False)
+        calc_id, history_count = None, await run_in_threadpool(_read_count)
+    return _add_response(request, history_count, calc_id, row["timestamp"])
+
+
+@app.post("/api/calc/add/batch")
+def calc_add_batch(requests: List[AddRequest], session: Annotated[Session, Depends(get_session)]):
+    # One pass to compute, one executemany INSERT, one commit for the whole array
+    rows = [new_row(r.a, r.b, r.name) for r in requests]
+    conn = session.connection()
+    ids = insert_calculations(conn, rows) if rows else []
+    history_count = bump_count(conn, len(ids)) if ids else read_count(conn)
+    session.commit()
 
     return {
-        "result": result,
-        "operation": f"{request.a} + {request.b}",
+        "count": len(ids),
+        "results": [row["result"] for row in rows],
+        "ids": ids,  # same order as the request array
         "history_count": history_count,
-        "message": f"Calculation saved forever{greeting}!",
-        "id": calc.id,
-        "timestamp": calc.timestamp.isoformat()
     }
 
 
-# NEW ENDPOINT: Get full history
-@app.get("/api/history")
-def get_history(session: Annotated[Session, Depends(get_session)], limit: int = 50):
-    calculations = session.exec(
-        select(Calculation)
-        .order_by(Calculation.timestamp.desc())
-        .limit(limit)
-    ).all()
+def _save_chunk(rows: List[dict]) -> dict:
+    # Summary only, so the reply does not grow with the number of rows
+    with engine.begin() as conn:
+        ids = insert_calculations(conn, rows)
+        history_count = bump_count(conn, len(ids))
+    return {"count": len(ids), "first_id": ids[0], "last_id": ids[-1], "history_count": history_count}
+
+
+async def _ndjson_lines(request: Request):
+    buffer = b""
+    async for piece in request.stream():
+        *lines, buffer = (buffer + piece).split(b"\n")
+        for line in lines:
+            yield line
+    yield buffer  # last line may have no trailing newline
+
+
+@app.post("/api/calc/add/batch/stream")
+async def calc_add_batch_stream(request: Request):
+    # Body = NDJSON, one AddRequest per line, read while it is still uploading.
+    # Rows are committed every BATCH_CHUNK_ROWS, so only one chunk of rows is in memory.
+    # The reply has one small NDJSON line per committed chunk, never per-row ids or results:
+    # {"count", "first_id", "last_id", "history_count"}. Ids ascend in input order within
+    # a chunk, but rows of concurrent writers may fall in between, so first..last is not
+    # exclusively this upload's. Use /api/calc/add/batch when per-row ids are needed.
+    # A bad line stops ingestion with an error line; chunks before it stay saved.
+    out = []
+    rows = []
+    line_no = 0
+    status_code = 200
+    async for line in _ndjson_lines(request):
+        line_no += 1
+        if not line.strip():
+            continue
+        try:
+            item = AddRequest.model_validate_json(line)
+        except ValidationError as exc:
+            # include_input=False: the offending input may be raw bytes, which json.dumps rejects
+            errors = exc.errors(include_url=False, include_input=False)
+            out.append(json.dumps({"error": errors, "line": line_no}))
+            rows = []
+            status_code = 422
+            break
+        rows.append(new_row(item.a, item.b, item.name))
+        if len(rows) >= BATCH_CHUNK_ROWS:
+            out.append(json.dumps(await run_in_threadpool(_save_chunk, rows)))
+            rows = []
+    if rows:
+        out.append(json.dumps(await run_in_threadpool(_save_chunk, rows)))
+
+    return Response(content="\n".join(out) + "\n", status_code=status_code, media_type="application/x-ndjson")
+
+
+# NEW ENDPOINT: Get full history (newest first, one page at a time)
+# Pass the returned next_cursor back as ?cursor=... to get the following page,
+# and ?fields=id,result,... to get only some columns.
+def get_history(
+    session: Annotated[Session, Depends(get_session)],
+    limit: Annotated[int, Query(ge=1)] = 50,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    try:
+        columns = parse_fields(fields)
+        stmt = history_page_query(limit, cursor, columns)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    rows = session.connection().execute(stmt).all()
+    return Response(content=history_page_json(rows, limit, columns), media_type="application/json")
+
+
+async def get_history_async(
+    session: Annotated[AsyncSession, Depends(get_async_session)],
+    limit: Annotated[int, Query(ge=1)] = 50,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    try:
+        columns = parse_fields(fields)
+        stmt = history_page_query(limit, cursor, columns)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    conn = await session.connection()
+    rows = (await conn.execute(stmt)).all()
+    return Response(content=history_page_json(rows, limit, columns), media_type="application/json")
+
+
+@app.get("/api/history/export")
+def export_history(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+):
+    # Streams the whole table (or [start, end)) with a server-side cursor,
+    # so exporting 100M rows uses the same memory as exporting 1k
+    rows = export_rows_async(format, start, end) if DB_MODE == "async" else export_rows(format, start, end)
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        rows,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="calculations.{format}"'},
+    )
+
+
+@app.get("/api/metrics/pool")
+async def pool_metrics():
+    # Per worker: checked-out/idle connections, overflow in use and time spent waiting for one
+    return pool_status()
+
+
+# DB_MODE picks which versions serve the routes, so both can be benchmarked
+if DB_MODE == "async":
+    app.post("/api/calc/add")(calc_add_write_behind if WRITE_MODE == "write_behind" else calc_add_async)
+    app.get("/api/history")(get_history_async)
+else:
+    app.post("/api/calc/add")(calc_add_write_behind if WRITE_MODE == "write_behind" else calc_add)
+    app.get("/api/history")(get_history)
+
+# Which artifact the API serves:
+#   pipeline = sklearn pipeline (ml/pipeline.pkl)
+#   compiled = compiled TF-IDF + LR scorer (python -m ml.trainer --export-compiled)
+#   mmap     = compiled scorer as memory-mapped arrays, shared by all workers (python -m ml.trainer --export-mmap)
+#   float16 / int8 = mmap with quantized idf/coef (python -m ml.trainer --quantize float16 int8)
+#   hashing  = HashingVectorizer pipeline, no vocabulary (python -m ml.trainer --vectorizer hashing)
+#   streaming = out-of-core SGD pipeline (python -m ml.trainer --streaming --data big.csv)
+MODEL_FORMAT = os.getenv("SPAM_MODEL_FORMAT", "pipeline")
+MODEL_ARTIFACTS = {
+    "pipeline": (MODEL_PATH, None),
+    "compiled": (COMPILED_PATH, lambda: export_compiled_scorer(train_and_save_model())),
+    "mmap": (MMAP_PATH, lambda: export_mmap_scorer(train_and_save_model())),
+    "hashing": (HASHING_MODEL_PATH, lambda: train_and_save_model(vectorizer="hashing")),
+    "streaming": (STREAMING_MODEL_PATH, train_streaming),
+    **{
+        dtype: (QUANTIZED_PATH.format(dtype=dtype), lambda dtype=dtype: export_quantized_scorers(train_and_save_model(), [dtype]))
+        for dtype in QUANTIZED_DTYPES
+    },
+}
+# What each format serves, reported by the detect endpoints
+MODEL_DESCRIPTIONS = {
+    "pipeline": "LogisticRegression + TF-IDF",
+    "compiled": "LogisticRegression + TF-IDF (compiled)",
+    "mmap": "LogisticRegression + TF-IDF (compiled, memory-mapped)",
+    "hashing": "LogisticRegression + TF-IDF on hashed features",
+    "streaming": "SGDClassifier (out-of-core) on hashed features",
+    **{dtype: f"LogisticRegression + TF-IDF (compiled, {dtype} weights)" for dtype in QUANTIZED_DTYPES},
+}
+
+if MODEL_FORMAT not in MODEL_ARTIFACTS:
+    raise ValueError(f"Unknown SPAM_MODEL_FORMAT {MODEL_FORMAT!r}, expected one of {list(MODEL_ARTIFACTS)}")
+
+# Loaded model + hot reload; request handlers only read its in-memory state
+model_path, train_fn = MODEL_ARTIFACTS[MODEL_FORMAT]
+model_registry = ModelRegistry(model_path, train_fn=train_fn)
+# All inference goes through this bounded pool, never the event loop
+spam_executor = InferenceExecutor(model_registry)
+spam_batcher = MicroBatcher(spam_executor.score)
+prediction_cache = PredictionCache()
+# Feedback → mini-batch partial_fit → new artifact published through the registry
+online_learner = OnlineLearner(model_registry)
+# Scheduled / API-triggered retraining in a low-priority child process
+retrainer = Retrainer(MODEL_FORMAT)
+
+
+async def _score_one(texts: List[str]):
+    if BATCHING:
+        # Scored together with other requests arriving in the same few milliseconds
+        return [await spam_batcher.submit(texts[0])]
+    return await spam_executor.score(texts)
+
+
+async def _score_cached(texts: List[str], score_fn) -> List[Tuple[str, float]]:
+    # Answer repeated texts from the cache; only unique misses reach the model
+    version = model_registry.version
+    prediction_cache.set_model_version(version)  # new model -> empty cache
+    keys = [cache_key(text) for text in texts]
+    results = [prediction_cache.get(key) for key in keys]
+    missing = {}
+    for key, text, result in zip(keys, texts, results):
+        if result is None:
+            missing.setdefault(key, text)
+    if not missing:
+        return results
+
+    scored = dict(zip(missing, await score_fn(list(missing.values()))))
+    # If the model was swapped while we were scoring, another request may already have
+    # emptied the cache for the new version: don't refill it with the old model's answers
+    if prediction_cache.model_version == version:
+        for key, result in scored.items():
+            prediction_cache.put(key, result)
+    return [result if result is not None else scored[key] for key, result in zip(keys, results)]
 
-    return calculations
 
 class SpamRequest(BaseModel):
     text: str = Field(..., min_length=1, max_length=1000, description="Message to classify")
 
+class SpamBatchRequest(BaseModel):
+    texts: List[Annotated[str, Field(min_length=1, max_length=1000)]] = Field(..., min_length=1)
+
+class SpamFeedbackRequest(BaseModel):
+    text: str = Field(..., min_length=1, max_length=1000)
+    label: Literal["ham", "spam"] = Field(..., description="The true label")
+
 @app.post("/api/spam/detect")
 async def detect_spam(request: SpamRequest):
-    if not os.path.exists("ml/pipeline.pkl"):
+    if not model_registry.ready:
         raise HTTPException(status_code=503, detail="Model is still training – try again in 10 seconds")
 
-    prediction = pipeline.predict([request.text])[0]
-    probability = pipeline.predict_proba([request.text])[0].max()
-
-    label = "spam" if prediction == 1 else "ham"
+    label, probability = (await _score_cached([request.text], _score_one))[0]
 
     return {
         "label": label,
         "confidence": round(probability * 100, 2),
         "text": request.text,
-        "model": "LogisticRegression + TF-IDF",
-        "trained_on": "SMS Spam Collection (5,572 messages)",
-        "accuracy_on_test": "~98.3%"  # from our run
-    }
\ No newline at end of file
+        "model": MODEL_DESCRIPTIONS[MODEL_FORMAT],
+        "model_version": model_registry.version,
+    }
+
+
+@app.post("/api/spam/detect/batch")
+async def detect_spam_batch(request: SpamBatchRequest):
+    if not model_registry.ready:
+        raise HTTPException(status_code=503, detail="Model is still training – try again in 10 seconds")
+
+    # One sparse transform + one predict_proba per SPAM_BATCH_CHUNK texts, in the executor
+    results = []
+    for start in range(0, len(request.texts), CHUNK_SIZE):
+        chunk = await _score_cached(request.texts[start:start + CHUNK_SIZE], spam_executor.score)
+        results.extend({"label": label, "confidence": round(probability * 100, 2)} for label, probability in chunk)
+
+    return {
+        "count": len(results),
+        "results": results,  # same order as request.texts
+        "model": MODEL_DESCRIPTIONS[MODEL_FORMAT],
+        "model_version": model_registry.version,
+    }
+
+
+@app.post("/api/spam/feedback", status_code=202)
+async def spam_feedback(request: SpamFeedbackRequest):
+    # Accepted feedback is applied by the next mini-batch update, not before this returns
+    if not online_learner.running:
+        raise HTTPException(status_code=409, detail="Online learning is off – set SPAM_ONLINE_LEARNING=1 with SPAM_MODEL_FORMAT=streaming")
+    if not model_registry.ready:
+        raise HTTPException(status_code=503, detail="Model is still training – try again in 10 seconds")
+    # Refuse rather than queue feedback that no update could ever apply
+    if not online_learner.supported:
+        raise HTTPException(status_code=409, detail="The served model cannot learn online – use SPAM_MODEL_FORMAT=streaming")
+
+    await online_learner.submit(request.text, request.label)
+    return {"queued": True, "pending": online_learner.stats()["pending"]}
+
+
+@app.post("/api/spam/retrain", status_code=202)
+async def spam_retrain():
+    # Starts retraining in the background; the new model is served once it passes the gate
+    if not retrainer.supported:
+        raise HTTPException(status_code=409, detail=f"Retraining is not available for SPAM_MODEL_FORMAT={MODEL_FORMAT}")
+    pid = retrainer.trigger()
+    if pid is None:
+        raise HTTPException(status_code=409, detail="Retraining is already running")
+    return {"started": True, "pid": pid}
+
+
+@app.get("/health")
+async def health():
+    # The calculator works as soon as the app is up; the spam model may still be training
+    return {
+        "status": "ok",
+        "model_ready": model_registry.ready,
+        "model_training": model_registry.training,
+        "model_version": model_registry.version,
+    }
+
+
+@app.get("/api/metrics/spam")
+async def spam_metrics():
+    # Achieved micro-batch sizes, inference queue depth and cache hit rate for this worker
+    return {
+        "pid": os.getpid(),
+        "model": {"format": MODEL_FORMAT, "ready": model_registry.ready, "version": model_registry.version},
+        "batcher": spam_batcher.stats(),
+        "executor": spam_executor.stats(),
+        "cache": prediction_cache.stats(),
+        "online": online_learner.stats(),
+        "retrain": retrainer.stats(),
+    }
@@ -0,0 +1,84 @@
+import asyncio
+import os
+from collections import Counter
+from typing import Awaitable, Callable, List, Optional, Set, Tuple
+
+from utils.queue_utils import collect
+
+# Off by default: batching trades a little latency (up to MAX_WAIT_MS) for throughput
+BATCHING = os.getenv("SPAM_BATCHING", "0") == "1"
+MAX_BATCH = int(os.getenv("SPAM_BATCH_MAX", "32"))        # run the model once this many texts are waiting...
+MAX_WAIT_MS = float(os.getenv("SPAM_BATCH_WAIT_MS", "2"))  # ...or once the first one waited this long
+
+
+class MicroBatcher:
+    # Collects texts from concurrent requests and scores them with ONE vectorized
+    # call, then hands each request its own result back. score_fn is async (it runs
+    # the model in the inference executor), so several batches can be in flight.
+    def __init__(
+        self,
+        score_fn: Callable[[List[str]], Awaitable[List[Tuple[str, float]]]],
+        max_batch: int = MAX_BATCH,
+        max_wait_ms: float = MAX_WAIT_MS,
+    ):
+        self.score_fn = score_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.batch_sizes = Counter()  # batch size -> how many batches had that size
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._in_flight: Set[asyncio.Task] = set()
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        self._task = None
+
+    async def submit(self, text: str) -> Tuple[str, float]:
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def _run(self):
+        while True:
+            batch = await collect(self._queue, self.max_batch, self.max_wait)
+
+            task = asyncio.create_task(self._score(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _score(self, batch: list):
+        try:
+            results = await self.score_fn([text for text, _ in batch])
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+        else:
+            self.batch_sizes[len(batch)] += 1
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    def stats(self) -> dict:
+        batches = sum(self.batch_sizes.values())
+        items = sum(size * count for size, count in self.batch_sizes.items())
+        return {
+            "enabled": self._task is not None,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": batches,
+            "items": items,
+            "avg_batch_size": round(items / batches, 2) if batches else 0.0,
+            "max_batch_size": max(self.batch_sizes, default=0),
+            "batch_size_histogram": dict(sorted(self.batch_sizes.items())),
+        }
@@ -0,0 +1,79 @@
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+CACHE_SIZE = int(os.getenv("SPAM_CACHE_SIZE", "100000"))        # entries, 0 = cache disabled
+CACHE_TTL = float(os.getenv("SPAM_CACHE_TTL_SECONDS", "0"))     # 0 = entries never expire
+
+
+def normalize(text: str) -> str:
+    # TfidfVectorizer lowercases and splits on non-word characters, so case and
+    # runs of whitespace never change what the model sees
+    return " ".join(text.lower().split())
+
+
+def cache_key(text: str) -> bytes:
+    return hashlib.blake2b(normalize(text).encode(), digest_size=16).digest()
+
+
+def artifact_version(path: str) -> Optional[str]:
+    # Changes whenever the model file is replaced
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+class PredictionCache:
+    # LRU cache of (label, probability) keyed by a hash of the normalized text.
+    # Only touched from the event loop, so no locking.
+    def __init__(self, max_size: int = CACHE_SIZE, ttl: float = CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.model_version: Optional[str] = None
+        self._entries: "OrderedDict[bytes, Tuple[float, Tuple[str, float]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def set_model_version(self, version: Optional[str]):
+        # A different model gives different answers: drop everything cached for the old one
+        if version != self.model_version:
+            self._entries.clear()
+            self.model_version = version
+
+    def get(self, key: bytes) -> Optional[Tuple[str, float]]:
+        entry = self._entries.get(key)
+        if entry is None or (self.ttl and time.monotonic() - entry[0] > self.ttl):
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: bytes, result: Tuple[str, float]):
+        if self.max_size <= 0:
+            return
+        self._entries[key] = (time.monotonic(), result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "model_version": self.model_version,
+        }
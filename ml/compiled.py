@@ -0,0 +1,218 @@
+import json
+import math
+import os
+import re
+import shutil
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ml.scorer import LABELS
+
+# Storage types CompiledScorer.quantize() can produce
+QUANTIZED_DTYPES = ("float16", "int8")
+
+
+class CompiledScorer:
+    # TF-IDF + LogisticRegression flattened into plain lookups, built by
+    # ml.trainer.compile_pipeline(). For one short SMS this skips sklearn's input
+    # validation, CSR construction and generic predict path:
+    #
+    #   tokens -> counts of in-vocabulary terms -> tf (raw / 1+log / binary) * idf
+    #   -> l2 (or l1) normalize -> dot with coef + intercept -> sigmoid
+    #
+    # Stop words never reach the vocabulary, so skipping out-of-vocabulary tokens
+    # drops them exactly like TfidfVectorizer does.
+    #
+    # The vocabulary is either a dict (pickled artifact) or `terms`, a sorted array of
+    # UTF-8 byte strings whose position is the column (memory-mapped artifact, see
+    # save_mmap / load_mmap); then lookups are one np.searchsorted per message.
+    #
+    # idf/coef may be quantized (see quantize): float16, or int8 with one scale factor
+    # per array, real value = stored value * scale. Only the few looked-up entries
+    # are widened to float64, so the math per message stays the same.
+    def __init__(
+        self,
+        vocabulary: Optional[Dict[str, int]],
+        idf: np.ndarray,
+        coef: np.ndarray,
+        intercept: float,
+        token_pattern: str,
+        lowercase: bool = True,
+        binary: bool = False,
+        sublinear_tf: bool = False,
+        norm: Optional[str] = "l2",
+        terms: Optional[np.ndarray] = None,
+        idf_scale: float = 1.0,
+        coef_scale: float = 1.0,
+    ):
+        self.vocabulary = vocabulary
+        self.terms = terms
+        self.idf = idf
+        self.coef = coef
+        self.intercept = float(intercept)
+        self.token_pattern = token_pattern
+        self.lowercase = lowercase
+        self.binary = binary
+        self.sublinear_tf = sublinear_tf
+        self.norm = norm
+        self.idf_scale = float(idf_scale)
+        self.coef_scale = float(coef_scale)
+        self._token_re = re.compile(token_pattern)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_token_re"]
+        return state
+
+    def __setstate__(self, state):
+        # Pickles written before mmap/quantization support lack these attributes
+        self.__dict__.update({"terms": None, "idf_scale": 1.0, "coef_scale": 1.0})
+        self.__dict__.update(state)
+        self._token_re = re.compile(self.token_pattern)
+
+    def _term_counts(self, tokens: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        # -> (column indices, raw counts) of the in-vocabulary tokens
+        if self.vocabulary is not None:
+            counts: Dict[int, int] = {}
+            for token in tokens:
+                index = self.vocabulary.get(token)
+                if index is not None:
+                    counts[index] = counts.get(index, 0) + 1
+            indices = np.fromiter(counts.keys(), dtype=np.intp, count=len(counts))
+            return indices, np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+
+        # Longer tokens cannot be terms, and numpy would silently truncate them to the array width
+        width = self.terms.dtype.itemsize
+        encoded = [token.encode() for token in tokens]
+        encoded = np.array([token for token in encoded if len(token) <= width], dtype=self.terms.dtype)
+        if not len(encoded):
+            return np.empty(0, dtype=np.intp), np.empty(0)
+        positions = np.minimum(np.searchsorted(self.terms, encoded), len(self.terms) - 1)
+        indices, counts = np.unique(positions[self.terms[positions] == encoded], return_counts=True)
+        return indices, counts.astype(np.float64)
+
+    def decision(self, text: str) -> float:
+        indices, tf = self._term_counts(self._token_re.findall(text.lower() if self.lowercase else text))
+        if not len(indices):
+            return self.intercept
+
+        if self.binary:
+            tf[:] = 1.0
+        elif self.sublinear_tf:
+            tf = np.log(tf) + 1.0
+        weights = tf * self.idf[indices]
+        if self.idf_scale != 1.0:
+            weights *= self.idf_scale
+
+        score = float(weights @ self.coef[indices]) * self.coef_scale
+        if self.norm == "l2":
+            score /= math.sqrt(float(weights @ weights))
+        elif self.norm == "l1":
+            score /= float(np.abs(weights).sum())
+        return score + self.intercept
+
+    def spam_probability(self, text: str) -> float:
+        # Same expit LogisticRegression.predict_proba uses for the positive class
+        z = self.decision(text)
+        if z >= 0:
+            return 1.0 / (1.0 + math.exp(-z))
+        e = math.exp(z)
+        return e / (1.0 + e)
+
+    def score(self, texts: List[str]) -> List[Tuple[str, float]]:
+        # Same contract as SpamScorer.score; ties (p == 0.5) go to ham like predict()
+        results = []
+        for text in texts:
+            p = self.spam_probability(text)
+            results.append((LABELS[1], p) if p > 0.5 else (LABELS[0], 1.0 - p))
+        return results
+
+    def quantize(self, dtype: str) -> "CompiledScorer":
+        # New scorer with idf/coef stored as "float16" or "int8" (symmetric, scale = max|x| / 127)
+        if dtype not in QUANTIZED_DTYPES:
+            raise ValueError(f"Unsupported quantization {dtype!r}, expected one of {QUANTIZED_DTYPES}")
+        if self.idf_scale != 1.0 or self.coef_scale != 1.0 or self.idf.dtype != np.float64:
+            raise ValueError("Scorer is already quantized")
+
+        arrays = {}
+        for name in ("idf", "coef"):
+            values = getattr(self, name)
+            if dtype == "float16":
+                arrays[name], arrays[f"{name}_scale"] = values.astype(np.float16), 1.0
+            else:
+                scale = float(np.abs(values).max()) / 127 or 1.0
+                arrays[name] = np.clip(np.rint(values / scale), -127, 127).astype(np.int8)
+                arrays[f"{name}_scale"] = scale
+        return CompiledScorer(
+            vocabulary=self.vocabulary,
+            terms=self.terms,
+            intercept=self.intercept,
+            token_pattern=self.token_pattern,
+            lowercase=self.lowercase,
+            binary=self.binary,
+            sublinear_tf=self.sublinear_tf,
+            norm=self.norm,
+            **arrays,
+        )
+
+    def save_mmap(self, manifest_path: str):
+        # Layout for memory-mapping: plain .npy arrays in a fresh directory next to a small
+        # JSON manifest. The manifest is renamed into place last, so a reader sees either the
+        # old model or the complete new one; every worker maps the same page-cache copy.
+        array_dir = f"{os.path.splitext(manifest_path)[0]}.{time.time_ns()}-{os.getpid()}"
+        os.makedirs(array_dir)
+
+        if self.terms is not None:
+            terms, idf, coef = self.terms, self.idf, self.coef
+        else:
+            # Sort terms by their UTF-8 bytes and move the weights into the same order
+            by_term = sorted(self.vocabulary.items(), key=lambda item: item[0].encode())
+            columns = np.array([index for _, index in by_term], dtype=np.intp)
+            terms = np.array([token.encode() for token, _ in by_term])
+            idf, coef = self.idf[columns], self.coef[columns]
+        np.save(os.path.join(array_dir, "terms.npy"), terms)
+        np.save(os.path.join(array_dir, "idf.npy"), idf)
+        np.save(os.path.join(array_dir, "coef.npy"), coef)
+
+        manifest = {
+            "arrays": os.path.basename(array_dir),
+            "intercept": self.intercept,
+            "token_pattern": self.token_pattern,
+            "lowercase": self.lowercase,
+            "binary": self.binary,
+            "sublinear_tf": self.sublinear_tf,
+            "norm": self.norm,
+            "idf_scale": self.idf_scale,
+            "coef_scale": self.coef_scale,
+        }
+        tmp_path = f"{manifest_path}.tmp-{os.getpid()}"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        old = _manifest_arrays(manifest_path)
+        os.replace(tmp_path, manifest_path)
+
+        # Workers still mapping the old files keep them alive until they reload (POSIX unlink semantics)
+        if old and old != array_dir:
+            shutil.rmtree(old, ignore_errors=True)
+
+    @classmethod
+    def load_mmap(cls, manifest_path: str, mmap_mode: Optional[str] = "r") -> "CompiledScorer":
+        # Near-zero load time: nothing is parsed or copied until a page is touched
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        array_dir = os.path.join(os.path.dirname(manifest_path), manifest.pop("arrays"))
+        arrays = {
+            name: np.load(os.path.join(array_dir, f"{name}.npy"), mmap_mode=mmap_mode)
+            for name in ("terms", "idf", "coef")
+        }
+        return cls(vocabulary=None, **arrays, **manifest)
+
+
+def _manifest_arrays(manifest_path: str) -> Optional[str]:
+    try:
+        with open(manifest_path) as f:
+            return os.path.join(os.path.dirname(manifest_path), json.load(f)["arrays"])
+    except (FileNotFoundError, ValueError, KeyError):
+        return None
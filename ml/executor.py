@@ -0,0 +1,100 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from ml.registry import ModelRegistry, load_scorer
+
+# "thread" (default): sklearn/NumPy release the GIL in their heavy parts, and threads share the model.
+# "process": full CPU isolation, each worker process loads its own copy of the model.
+EXECUTOR_KIND = os.getenv("SPAM_EXECUTOR", "thread")
+WORKERS = int(os.getenv("SPAM_EXECUTOR_WORKERS", "2"))
+# Max inference jobs inside the pool (running + queued); callers beyond that wait their turn
+MAX_PENDING = int(os.getenv("SPAM_EXECUTOR_MAX_PENDING", "64"))
+
+# Set in each worker process by _init_worker (process mode only)
+_worker_scorer = None
+
+
+def _init_worker(model_path: str):
+    global _worker_scorer
+    _worker_scorer = load_scorer(model_path)
+
+
+def _score_in_worker(texts: List[str]) -> List[Tuple[str, float]]:
+    return _worker_scorer.score(texts)
+
+
+class InferenceExecutor:
+    # Runs model inference off the event loop in a dedicated, bounded pool, so a burst of
+    # spam requests cannot stall /api/history or / and cannot eat FastAPI's shared threadpool.
+    def __init__(self, registry: ModelRegistry, kind: str = EXECUTOR_KIND,
+                 workers: int = WORKERS, max_pending: int = MAX_PENDING):
+        self.registry = registry
+        self.kind = kind
+        self.workers = workers
+        self.max_pending = max_pending
+        self._pool: Optional[Executor] = None
+        # Guards swapping the pool (watcher thread) against submitting to it (event loop):
+        # a job must never go to a pool that was already shut down
+        self._pool_lock = threading.Lock()
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.waiting = 0     # callers blocked because max_pending jobs are already in the pool
+        self.in_pool = 0     # jobs handed to the pool (running or queued there)
+        self.completed = 0
+
+    def _new_pool(self) -> Executor:
+        if self.kind == "process":
+            return ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_init_worker, initargs=(self.registry.path,)
+            )
+        return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="spam-inference")
+
+    def start(self):
+        self._pool = self._new_pool()
+        if self.kind == "process":
+            # Worker processes hold their own copy of the model: replace them when it changes
+            self.registry.on_reload(lambda version: self._restart())
+
+    def _restart(self):
+        new_pool = self._new_pool()
+        with self._pool_lock:
+            old_pool, self._pool = self._pool, new_pool
+        if old_pool is not None:
+            old_pool.shutdown(wait=False)  # jobs already running there still finish
+
+    def stop(self):
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    async def score(self, texts: List[str]) -> List[Tuple[str, float]]:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+
+        self.waiting += 1
+        async with self._slots:
+            self.waiting -= 1
+            self.in_pool += 1
+            try:
+                # Thread mode reads the registry at call time, so a swapped model is used right away
+                fn = _score_in_worker if self.kind == "process" else self.registry.scorer.score
+                with self._pool_lock:
+                    future = self._pool.submit(fn, texts)
+                return await asyncio.wrap_future(future)
+            finally:
+                self.in_pool -= 1
+                self.completed += 1
+
+    def stats(self) -> dict:
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "in_pool": self.in_pool,
+            "queued_in_pool": max(self.in_pool - self.workers, 0),
+            "waiting_for_slot": self.waiting,
+            "completed": self.completed,
+        }
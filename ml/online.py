@@ -0,0 +1,125 @@
+import asyncio
+import copy
+import os
+import time
+from datetime import datetime
+from typing import List, Optional
+
+import numpy as np
+
+from ml.registry import ModelRegistry, fcntl
+from ml.scorer import LABELS
+from utils.queue_utils import collect
+
+# SPAM_ONLINE_LEARNING=1 turns on /api/spam/feedback updates (needs an SGD model, e.g. SPAM_MODEL_FORMAT=streaming)
+ONLINE_LEARNING = os.getenv("SPAM_ONLINE_LEARNING", "0") == "1"
+FEEDBACK_QUEUE_SIZE = int(os.getenv("SPAM_FEEDBACK_QUEUE_SIZE", "10000"))  # max examples waiting in memory
+FEEDBACK_BATCH = int(os.getenv("SPAM_FEEDBACK_BATCH", "64"))               # update once this many arrived...
+FEEDBACK_MAX_WAIT = float(os.getenv("SPAM_FEEDBACK_MAX_WAIT_S", "30"))     # ...or the oldest waited this long
+
+LABEL_IDS = {name: class_id for class_id, name in LABELS.items()}
+
+
+def supports_online_updates(pipeline) -> bool:
+    # Only the classifier is updated; earlier steps must be stateless (HashingVectorizer)
+    return hasattr(pipeline, "steps") and hasattr(pipeline.steps[-1][1], "partial_fit")
+
+
+class OnlineLearner:
+    # Feedback examples go into a bounded queue; a background task groups them into
+    # mini-batches and applies one partial_fit per batch to a copy of the served
+    # pipeline. The copy is written over the registry's artifact (save_model: temp file
+    # + rename) and loaded, so this worker swaps to it immediately and the other
+    # workers' watchers pick it up on their next poll. A file lock serializes updates
+    # across workers, and each update starts from the newest artifact on disk, so no
+    # worker's feedback overwrites another's.
+    def __init__(self, registry: ModelRegistry, batch_size: int = FEEDBACK_BATCH,
+                 max_wait: float = FEEDBACK_MAX_WAIT, max_size: int = FEEDBACK_QUEUE_SIZE):
+        self.registry = registry
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.max_size = max_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.updates = 0
+        self.examples = 0
+        self.last_update: Optional[str] = None
+        self.last_update_seconds: Optional[float] = None
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._task = asyncio.create_task(self._run())
+        if self.registry.ready and not self.supported:
+            print(f"[ML] Online learning is on, but {self.registry.path} has no partial_fit: feedback will be refused")
+
+    async def stop(self):
+        # Apply whatever feedback is still queued, then stop the background task
+        if self._task is None:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        self._task = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    @property
+    def supported(self) -> bool:
+        # Whether the model being served right now can take partial_fit updates
+        return self.registry.ready and supports_online_updates(getattr(self.registry.scorer, "pipeline", None))
+
+    async def submit(self, text: str, label: str):
+        # Waits for free space when the queue is full (backpressure instead of dropping feedback)
+        await self._queue.put((text, LABEL_IDS[label]))
+
+    async def _run(self):
+        while True:
+            batch = await collect(self._queue, self.batch_size, self.max_wait)
+
+            try:
+                # Fitting and writing the artifact block, so run them in a worker thread
+                await asyncio.to_thread(self._update, [text for text, _ in batch], [label for _, label in batch])
+            except Exception as exc:
+                # Nobody waits on feedback, so log it; the served model stays as it was
+                print(f"[ML] Online update with {len(batch)} examples failed: {exc}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _update(self, texts: List[str], labels: List[int]):
+        start = time.perf_counter()
+        with open(f"{self.registry.path}.lock", "w") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            self.registry.load()  # newest weights, possibly published by another worker
+            pipeline = getattr(self.registry.scorer, "pipeline", None)
+            if not supports_online_updates(pipeline):
+                raise ValueError(f"{self.registry.path} is not an SGD pipeline (serve SPAM_MODEL_FORMAT=streaming)")
+
+            # Never mutate the model that is serving requests right now
+            pipeline = copy.deepcopy(pipeline)
+            features = pipeline[:-1].transform(texts)
+            pipeline.steps[-1][1].partial_fit(features, np.array(labels))
+
+            from ml.trainer import save_model
+
+            save_model(pipeline, self.registry.path)
+            self.registry.load()
+
+        self.updates += 1
+        self.examples += len(texts)
+        self.last_update = datetime.now().isoformat()
+        self.last_update_seconds = time.perf_counter() - start
+        print(f"[ML] [{self.last_update}] Online update: {len(texts)} examples → version {self.registry.version}")
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.running,
+            "supported": self.supported,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "updates": self.updates,
+            "examples": self.examples,
+            "last_update": self.last_update,
+            "last_update_seconds": self.last_update_seconds,
+        }
@@ -0,0 +1,126 @@
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Optional, Tuple
+
+import joblib
+
+from ml.cache import artifact_version
+from ml.compiled import CompiledScorer
+from ml.scorer import SpamScorer
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, each worker may train on its own
+    fcntl = None
+
+# How often the watcher checks the artifact for a new version (one stat call, off the request path)
+POLL_SECONDS = float(os.getenv("SPAM_MODEL_POLL_SECONDS", "5"))
+# Train in the background when the API starts without a model file
+TRAIN_ON_STARTUP = os.getenv("SPAM_TRAIN_ON_STARTUP", "1") == "1"
+
+
+def load_scorer(path: str):
+    # A model file holds either a fitted sklearn pipeline or a CompiledScorer;
+    # a .json path is the manifest of a memory-mapped CompiledScorer
+    if path.endswith(".json"):
+        return CompiledScorer.load_mmap(path)
+    model = joblib.load(path)
+    return model if isinstance(model, CompiledScorer) else SpamScorer(model)
+
+
+class ModelRegistry:
+    # Holds the loaded model in memory. A background thread watches the artifact's
+    # mtime/size, loads a new version next to the old one, then swaps it in with a
+    # single attribute assignment, so requests never see a half-loaded model and
+    # never touch the filesystem.
+    def __init__(self, path: str, poll_seconds: float = POLL_SECONDS, train_fn: Optional[Callable] = None):
+        self.path = path
+        self.poll_seconds = poll_seconds
+        self.train_fn = train_fn  # writes the artifact at self.path; default: train_and_save_model
+        self._current: Optional[Tuple[SpamScorer, str]] = None
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        self._reload_hooks = []
+        self._load_lock = threading.Lock()
+        self.training = False
+        self.load_seconds: Optional[float] = None  # how long the last load took
+
+    @property
+    def ready(self) -> bool:
+        return self._current is not None
+
+    @property
+    def scorer(self) -> SpamScorer:
+        return self._current[0]
+
+    @property
+    def version(self) -> Optional[str]:
+        return self._current[1] if self._current else None
+
+    def on_reload(self, hook):
+        # hook(version) runs in the watcher thread after every swap
+        self._reload_hooks.append(hook)
+
+    def publish(self, scorer, version: str):
+        self._current = (scorer, version)
+        for hook in self._reload_hooks:
+            hook(version)
+
+    def load(self) -> bool:
+        # Called by the watcher, _train and OnlineLearner; the lock keeps a slow load of
+        # an older version from being published after a newer one
+        with self._load_lock:
+            version = artifact_version(self.path)
+            if version is None or version == self.version:
+                return False
+            start = time.perf_counter()
+            self.publish(load_scorer(self.path), version)
+            self.load_seconds = time.perf_counter() - start
+        print(f"[ML] [{datetime.now()}] Loaded model {self.path} (version {version})")
+        return True
+
+    def start(self, train_if_missing: bool = TRAIN_ON_STARTUP):
+        # Never blocks: with no model file the API starts right away and reports
+        # "not ready" until background training has produced one
+        self.load()
+        if not self.ready and train_if_missing:
+            self.training = True
+            threading.Thread(target=self._train, name="model-trainer", daemon=True).start()
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, name="model-watcher", daemon=True)
+        self._watcher.start()
+
+    def _train(self):
+        from ml.trainer import train_and_save_model
+
+        try:
+            # Only one worker process trains; the others wait on the lock and then
+            # find the finished file. Checked here rather than left to train_fn, because
+            # exporters and train_streaming always rebuild, and every rewrite would make
+            # all workers reload and drop their prediction caches again.
+            with open(f"{self.path}.lock", "w") as lock:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                if not os.path.exists(self.path):
+                    (self.train_fn or train_and_save_model)()
+            self.load()
+        except Exception as exc:
+            print(f"[ML] Background training failed: {exc}")
+        finally:
+            self.training = False
+
+    def stop(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.load()
+            except Exception as exc:
+                # Keep serving the previous model; a half-written file gets retried next poll
+                print(f"[ML] Could not load {self.path}: {exc}")
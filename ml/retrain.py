@@ -0,0 +1,175 @@
+# Background retraining in a separate, low-priority process.
+#
+#   python -m ml.retrain --format pipeline   # what Retrainer runs; also usable from cron
+#
+# The child fits with ml.trainer.retrain_model (temp file → accuracy gate → atomic
+# rename), so the serving processes never wait on it: their registry watchers load the
+# new artifact once it has been renamed into place.
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+import joblib
+
+from ml.registry import fcntl
+from ml.trainer import (
+    HASHING_MODEL_PATH, MODEL_PATH, retrain_model, export_compiled_scorer, export_mmap_scorer,
+    export_quantized_scorers,
+)
+
+# 0 = retrain only when triggered through the API; otherwise at most once per interval
+RETRAIN_INTERVAL = float(os.getenv("SPAM_RETRAIN_INTERVAL_S", "0"))
+RETRAIN_NICE = int(os.getenv("SPAM_RETRAIN_NICE", "10"))        # added to the child's nice level
+RETRAIN_THREADS = int(os.getenv("SPAM_RETRAIN_THREADS", "1"))   # BLAS/OpenMP threads in the child
+RETRAIN_CPUS = os.getenv("SPAM_RETRAIN_CPUS", "")               # e.g. "3" or "2,3": pin the child to these cores
+
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "NUMEXPR_NUM_THREADS")
+
+# Served artifacts that are derived from a retrained pipeline, per SPAM_MODEL_FORMAT
+EXPORTS = {
+    "compiled": export_compiled_scorer,
+    "mmap": export_mmap_scorer,
+    "float16": lambda pipeline: export_quantized_scorers(pipeline, ["float16"]),
+    "int8": lambda pipeline: export_quantized_scorers(pipeline, ["int8"]),
+}
+FORMATS = ("pipeline", "hashing", *EXPORTS)
+
+
+def source_path(model_format: str) -> str:
+    # The pipeline artifact retrain_model replaces for this format
+    return HASHING_MODEL_PATH if model_format == "hashing" else MODEL_PATH
+
+
+def lower_priority(nice: int = RETRAIN_NICE, cpus: str = RETRAIN_CPUS):
+    # Applied by the child to itself: serving workers always win the CPU
+    if nice and hasattr(os, "nice"):
+        os.nice(nice)
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {int(cpu) for cpu in cpus.split(",")})
+
+
+def run(model_format: str) -> dict:
+    path = source_path(model_format)
+    with open(f"{path}.retrain.lock", "w") as lock:
+        # One retrain per artifact at a time, across all workers and cron
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                print(f"[ML] Retrain of {path} already running elsewhere, skipping")
+                return {"path": path, "swapped": False, "skipped": True}
+
+        result = retrain_model(path, vectorizer="hashing" if model_format == "hashing" else "tfidf")
+        if result["swapped"] and model_format in EXPORTS:
+            EXPORTS[model_format](joblib.load(path))
+        return result
+
+
+class Retrainer:
+    # Starts `python -m ml.retrain` as a child process (API trigger or schedule) and
+    # tracks its outcome. The child gets RETRAIN_THREADS BLAS/OpenMP threads, a higher
+    # nice level and optionally its own cores, and is never awaited by a request.
+    def __init__(self, model_format: str, interval: float = RETRAIN_INTERVAL):
+        self.model_format = model_format
+        self.interval = interval
+        self._proc: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._scheduler: Optional[threading.Thread] = None
+        self.runs = 0
+        self.last_started: Optional[str] = None
+        self.last_finished: Optional[str] = None
+        self.last_exit_code: Optional[int] = None
+        self.last_result: Optional[dict] = None
+
+    @property
+    def supported(self) -> bool:
+        return self.model_format in FORMATS
+
+    @property
+    def running(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None
+
+    def trigger(self) -> Optional[int]:
+        # -> pid of the new child, or None if one is already running
+        with self._lock:
+            if self.running:
+                return None
+            env = dict(os.environ, PYTHONUNBUFFERED="1", **{name: str(RETRAIN_THREADS) for name in THREAD_ENV_VARS})
+            self._proc = subprocess.Popen(
+                [sys.executable, "-m", "ml.retrain", "--format", self.model_format],
+                env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+            )
+            self.runs += 1
+            self.last_started = datetime.now().isoformat()
+            threading.Thread(target=self._monitor, args=(self._proc,), name="retrain-monitor", daemon=True).start()
+            return self._proc.pid
+
+    def _monitor(self, proc: subprocess.Popen):
+        # Forward the child's log; its last line is the JSON result
+        last_line = None
+        for line in proc.stdout:
+            line = line.rstrip()
+            if line:
+                print(f"[RETRAIN {proc.pid}] {line}")
+                last_line = line
+        self.last_exit_code = proc.wait()
+        self.last_finished = datetime.now().isoformat()
+        try:
+            self.last_result = json.loads(last_line) if self.last_exit_code == 0 else None
+        except (TypeError, ValueError):
+            self.last_result = None
+
+    def start(self):
+        if self.interval > 0 and self.supported:
+            self._stop.clear()
+            self._scheduler = threading.Thread(target=self._schedule, name="retrain-scheduler", daemon=True)
+            self._scheduler.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._scheduler is not None:
+            self._scheduler.join()
+            self._scheduler = None
+        if self.running:
+            # The temp artifact of an interrupted run is never renamed into place
+            self._proc.terminate()
+
+    def _schedule(self):
+        path = source_path(self.model_format)
+        while not self._stop.wait(self.interval):
+            # Every worker runs this loop; whoever retrains first refreshes the mtime,
+            # so the others skip until the artifact is `interval` old again
+            try:
+                age = time.time() - os.path.getmtime(path)
+            except OSError:
+                age = self.interval
+            if age >= self.interval:
+                self.trigger()
+
+    def stats(self) -> dict:
+        return {
+            "supported": self.supported,
+            "running": self.running,
+            "pid": self._proc.pid if self.running else None,
+            "interval_seconds": self.interval,
+            "runs": self.runs,
+            "last_started": self.last_started,
+            "last_finished": self.last_finished,
+            "last_exit_code": self.last_exit_code,
+            "last_result": self.last_result,
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Retrain the spam model and swap it in if it passes the accuracy gate")
+    parser.add_argument("--format", choices=FORMATS, default="pipeline", help="SPAM_MODEL_FORMAT being served")
+    args = parser.parse_args()
+    lower_priority()
+    print(json.dumps(run(args.format)))
@@ -0,0 +1,24 @@
+import os
+from typing import List, Tuple
+
+# Class ids used by trainer.py: ham = 0, spam = 1
+LABELS = {0: "ham", 1: "spam"}
+
+# Texts per transform/predict_proba call for batch scoring; bounds the size of
+# the sparse TF-IDF matrix and probability array held at once
+CHUNK_SIZE = int(os.getenv("SPAM_BATCH_CHUNK", "10000"))
+
+
+class SpamScorer:
+    # Wraps the fitted pipeline so every call does ONE TF-IDF transform and ONE
+    # predict_proba; the label is the most likely class, which is what predict() returns.
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+
+    def score(self, texts: List[str]) -> List[Tuple[str, float]]:
+        # -> [(label, probability of that label), ...] in the same order as texts
+        proba = self.pipeline.predict_proba(texts)
+        best = proba.argmax(axis=1)
+        labels = self.pipeline.classes_[best]
+        confidences = proba[range(len(texts)), best]
+        return [(LABELS[int(label)], float(confidence)) for label, confidence in zip(labels, confidences)]
@@ -1,17 +1,68 @@
 import pandas as pd
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
+from sklearn.feature_extraction.text import TfidfVectorizer, HashingVectorizer, TfidfTransformer
+from sklearn.linear_model import LogisticRegression, SGDClassifier
 from sklearn.pipeline import Pipeline
-from sklearn.model_selection import train_test_split
+from sklearn.base import clone
+from sklearn.model_selection import train_test_split, GridSearchCV, RandomizedSearchCV
 from sklearn.metrics import classification_report, confusion_matrix
 import joblib
+import argparse
 import os
+import tempfile
+import time
 from datetime import datetime
 
+try:
+    import resource
+except ImportError:  # Windows: no getrusage, peak memory is not logged
+    resource = None
+
+from ml.compiled import CompiledScorer, QUANTIZED_DTYPES
+
 # Paths
 DATA_PATH = "ml/spam.csv"
-MODEL_PATH = "ml/pipeline.pkl"
+MODEL_PATH = os.getenv("SPAM_MODEL_PATH", "ml/pipeline.pkl")
+COMPILED_PATH = os.getenv("SPAM_COMPILED_PATH", "ml/pipeline_compiled.pkl")
+MMAP_PATH = os.getenv("SPAM_MMAP_PATH", "ml/pipeline_mmap.json")  # manifest; arrays live next to it
+# Stateless variant: HashingVectorizer + TfidfTransformer, no vocabulary dict to pickle/load
+HASHING_MODEL_PATH = os.getenv("SPAM_HASHING_MODEL_PATH", "ml/pipeline_hashing.pkl")
+HASH_BUCKETS = int(os.getenv("SPAM_HASH_BUCKETS", str(2 ** 18)))
+# Out-of-core variant: hashed features + SGDClassifier trained chunk by chunk (train_streaming)
+STREAMING_MODEL_PATH = os.getenv("SPAM_STREAMING_MODEL_PATH", "ml/pipeline_streaming.pkl")
+CHUNK_ROWS = int(os.getenv("SPAM_TRAIN_CHUNK_ROWS", "50000"))
+HOLDOUT_EVERY = 5  # every 5th row is held out (same 20% as the in-memory split)
+# Accuracy gate for retrain_model: the candidate must reach this on the held-out split...
+RETRAIN_MIN_ACCURACY = float(os.getenv("SPAM_RETRAIN_MIN_ACCURACY", "0.95"))
+# ...and may not be more than this below the model it replaces
+RETRAIN_MAX_REGRESSION = float(os.getenv("SPAM_RETRAIN_MAX_REGRESSION", "0.005"))
+# Hyperparameter search (tune_model): parallel jobs (-1 = all cores) and CV folds
+TUNE_JOBS = int(os.getenv("SPAM_TUNE_JOBS", "-1"))
+TUNE_FOLDS = int(os.getenv("SPAM_TUNE_FOLDS", "5"))
+# Unigrams only: the compiled / mmap / quantized scorers do not support n-grams
+PARAM_GRID = {
+    "tfidf__max_features": [2000, 5000, 10000, None],
+    "tfidf__sublinear_tf": [False, True],
+    "tfidf__min_df": [1, 2],
+    "clf__C": [1.0, 10.0, 100.0],
+    "clf__class_weight": [None, "balanced"],
+}
+# Quantized scorers (memory-mapped layout), one per storage type: ml/pipeline_float16.json, ml/pipeline_int8.json
+QUANTIZED_PATH = os.getenv("SPAM_QUANTIZED_PATH", "ml/pipeline_{dtype}.json")
+
+# Inputs that stress the tokenizer/normalization on top of the real messages in the parity check
+PARITY_EDGE_CASES = [
+    "",
+    "!!!",
+    "a b c d",
+    "FREE free FrEe",
+    "free free free free free prize",
+    "the and of to",
+    "Café naïve résumé",
+    "call 08712460324 now",
+    "u r a winner\n\t\tclaim   ur prize",
+    "x" * 1000,
+]
 
 # Dataset URL (permanent, works forever)
 URL = "https://raw.githubusercontent.com/mohitgupta-omg/Kaggle-SMS-Spam-Collection-Dataset-/master/spam.csv"
@@ -30,15 +81,17 @@ def download_data():
         print(f"[ML] Dataset saved to {len(df)} messages saved to {DATA_PATH}")
 
 
-def train_and_save_model():
-    os.makedirs("ml", exist_ok=True)
-
-    if os.path.exists(MODEL_PATH):
-        print(f"[ML] Model found → loading from {MODEL_PATH}")
-        return joblib.load(MODEL_PATH)
+def save_model(pipeline, path: str = MODEL_PATH):
+    # Write next to the target, then rename over it: readers (the API's model watcher)
+    # only ever see the old file or the complete new one
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    joblib.dump(pipeline, tmp_path)
+    os.replace(tmp_path, path)
 
-    print(f"[{datetime.now()}] Training spam detector from scratch...")
 
+def load_split():
+    # The held-out split every training/evaluation path uses: (X_train, X_test, y_train, y_test)
     # ← THIS WAS MISSING ←
     download_data()  # ← NOW IT WILL DOWNLOAD IF NEEDED
 
@@ -48,14 +101,43 @@ def train_and_save_model():
     y = df.label.map({'ham': 0, 'spam': 1})
     X = df.text
 
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42, stratify=y
-    )
+    return train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+
+
+def build_pipeline(vectorizer: str = "tfidf", n_buckets: int = HASH_BUCKETS, memory=None) -> Pipeline:
+    # "tfidf"   = TfidfVectorizer with a 5000-term vocabulary (the served model)
+    # "hashing" = HashingVectorizer into n_buckets columns + TfidfTransformer: same
+    #             tokens and stop words, but the only fitted state is the idf vector
+    # memory = Pipeline cache for fitted vectorizers (hyperparameter search only)
+    clf = LogisticRegression(random_state=42, max_iter=1000)
+    if vectorizer == "tfidf":
+        return Pipeline([
+            ('tfidf', TfidfVectorizer(stop_words='english', max_features=5000)),
+            ('clf', clf)
+        ], memory=memory)
+    if vectorizer == "hashing":
+        return Pipeline([
+            ('hashing', HashingVectorizer(stop_words='english', n_features=n_buckets, alternate_sign=False, norm=None)),
+            ('tfidf', TfidfTransformer()),
+            ('clf', clf)
+        ], memory=memory)
+    raise ValueError(f"Unknown vectorizer {vectorizer!r}, expected 'tfidf' or 'hashing'")
+
+
+def train_and_save_model(force: bool = False, vectorizer: str = "tfidf", n_buckets: int = HASH_BUCKETS,
+                         path: str = None):
+    os.makedirs("ml", exist_ok=True)
+    path = path or (HASHING_MODEL_PATH if vectorizer == "hashing" else MODEL_PATH)
+
+    if os.path.exists(path) and not force:
+        print(f"[ML] Model found → loading from {path}")
+        return joblib.load(path)
+
+    print(f"[{datetime.now()}] Training spam detector from scratch...")
+
+    X_train, X_test, y_train, y_test = load_split()
 
-    pipeline = Pipeline([
-        ('tfidf', TfidfVectorizer(stop_words='english', max_features=5000)),
-        ('clf', LogisticRegression(random_state=42, max_iter=1000))
-    ])
+    pipeline = build_pipeline(vectorizer, n_buckets)
 
     pipeline.fit(X_train, y_train)
 
@@ -66,11 +148,328 @@ def train_and_save_model():
     tn, fp, fn, tp = confusion_matrix(y_test, y_pred).ravel()
     print(f"[ML] True Ham: {tn} | False Spam: {fp} | Missed Spam: {fn} | True Spam: {tp}")
 
-    joblib.dump(pipeline, MODEL_PATH)
-    print(f"[ML] Model trained and saved → {MODEL_PATH}")
+    save_model(pipeline, path)
+    print(f"[ML] Model trained and saved → {path}")
+
+    return pipeline
+
+
+def accuracy(pipeline, X, y) -> float:
+    return float((pipeline.predict(X) == y.to_numpy()).mean())
+
+
+def retrain_model(path: str = MODEL_PATH, vectorizer: str = "tfidf", n_buckets: int = HASH_BUCKETS,
+                  min_accuracy: float = RETRAIN_MIN_ACCURACY, max_regression: float = RETRAIN_MAX_REGRESSION) -> dict:
+    # Fit a fresh model, write it to a temp file next to `path`, reload that file and
+    # check it against the accuracy gate, and only then rename it over `path`. The
+    # serving processes keep the old model until the rename, then their registry
+    # watchers load the new one; a rejected candidate never becomes visible.
+    # An existing artifact is refit with its own hyperparameters (clone), so settings
+    # picked by tune_model carry over; the defaults only apply to the first model.
+    X_train, X_test, y_train, y_test = load_split()
+    previous = joblib.load(path) if os.path.exists(path) else None
+    print(f"[{datetime.now()}] Retraining {vectorizer} model for {path}...")
+    pipeline = clone(previous) if previous is not None else build_pipeline(vectorizer, n_buckets)
+    pipeline.fit(X_train, y_train)
+
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    joblib.dump(pipeline, tmp_path)
+    try:
+        candidate = accuracy(joblib.load(tmp_path), X_test, y_test)  # exactly what will be served
+        current = accuracy(previous, X_test, y_test) if previous is not None else None
+        gate = min_accuracy if current is None else max(min_accuracy, current - max_regression)
+        result = {"path": path, "accuracy": candidate, "previous_accuracy": current, "gate": gate,
+                  "swapped": candidate >= gate}
+        if result["swapped"]:
+            os.replace(tmp_path, path)
+            print(f"[ML] New model accepted (accuracy {candidate:.4f} >= gate {gate:.4f}) → {path}")
+        else:
+            print(f"[ML] New model rejected (accuracy {candidate:.4f} < gate {gate:.4f}), keeping {path}")
+        return result
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def tune_model(search: str = "grid", n_iter: int = 20, n_jobs: int = TUNE_JOBS, folds: int = TUNE_FOLDS,
+               path: str = MODEL_PATH, top: int = 10) -> Pipeline:
+    # Cross-validated search over PARAM_GRID on the training split, fits spread over
+    # n_jobs processes by joblib. The pipeline caches fitted TfidfVectorizers on disk
+    # (Pipeline memory=), so candidates that only differ in clf__* reuse the features
+    # of their fold instead of re-tokenizing. The best pipeline is refit on the whole
+    # training split, checked on the held-out split and saved as the model artifact.
+    from scipy.stats import loguniform
+
+    X_train, X_test, y_train, y_test = load_split()
+    with tempfile.TemporaryDirectory(prefix="spam-tune-") as cache_dir:
+        pipeline = build_pipeline("tfidf", memory=joblib.Memory(cache_dir, verbose=0))
+        options = dict(scoring={"accuracy": "accuracy", "f1": "f1"}, refit="accuracy", cv=folds, n_jobs=n_jobs)
+        if search == "grid":
+            searcher = GridSearchCV(pipeline, PARAM_GRID, **options)
+        elif search == "random":
+            distributions = dict(PARAM_GRID, clf__C=loguniform(0.1, 1000))
+            searcher = RandomizedSearchCV(pipeline, distributions, n_iter=n_iter, random_state=42, **options)
+        else:
+            raise ValueError(f"Unknown search {search!r}, expected 'grid' or 'random'")
+
+        start = time.perf_counter()
+        print(f"[{datetime.now()}] Tuning: {search} search, {folds}-fold CV, n_jobs={n_jobs}...")
+        searcher.fit(X_train, y_train)
+        elapsed = time.perf_counter() - start
+
+    results = pd.DataFrame(searcher.cv_results_)
+    table = results.sort_values("rank_test_accuracy").head(top)
+    print(f"\n[ML] {len(results)} candidates x {folds} folds in {elapsed:.1f}s; top {len(table)} by CV accuracy:")
+    print(f"{'rank':>4} {'accuracy':>16} {'f1':>7} {'fit s':>6}  params")
+    for _, row in table.iterrows():
+        params = ", ".join(f"{name.split('__')[1]}={value}" for name, value in row.params.items())
+        print(f"{row.rank_test_accuracy:>4} {row.mean_test_accuracy:>8.4f} ± {row.std_test_accuracy:.4f} "
+              f"{row.mean_test_f1:>7.4f} {row.mean_fit_time:>6.2f}  {params}")
+
+    best = searcher.best_estimator_.set_params(memory=None)  # the cache directory is gone
+    baseline = build_pipeline("tfidf").fit(X_train, y_train)
+    print(f"\n[ML] Held-out accuracy: best {accuracy(best, X_test, y_test):.4f} | "
+          f"current defaults {accuracy(baseline, X_test, y_test):.4f}")
+
+    save_model(best, path)
+    print(f"[ML] Best pipeline saved → {path}")
+    return best
 
+
+def _peak_rss_mb():
+    if resource is None:
+        return float("nan")
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+def _read_chunks(data_path: str, chunk_rows: int):
+    # -> (chunk number, texts, labels, held-out mask); only one chunk is ever in memory
+    row = 0
+    for number, chunk in enumerate(pd.read_csv(data_path, usecols=["label", "text"], chunksize=chunk_rows), 1):
+        chunk = chunk.dropna()
+        labels = chunk.label.map({'ham': 0, 'spam': 1}).to_numpy()
+        holdout = (np.arange(row, row + len(chunk)) % HOLDOUT_EVERY) == 0
+        row += len(chunk)
+        yield number, chunk.text.astype(str), labels, holdout
+
+
+def train_streaming(data_path: str = DATA_PATH, path: str = STREAMING_MODEL_PATH, chunk_rows: int = CHUNK_ROWS,
+                    n_buckets: int = HASH_BUCKETS, epochs: int = 1) -> Pipeline:
+    # Out-of-core training for corpora that do not fit in memory. The CSV is read
+    # chunk_rows at a time, hashed by a stateless HashingVectorizer (no vocabulary, no
+    # global idf pass) and fed to SGDClassifier(loss="log_loss").partial_fit, so peak
+    # memory depends on chunk_rows and n_buckets, not on the corpus size.
+    # Rows are not shuffled across chunks: the CSV should not be sorted by label.
+    if data_path == DATA_PATH:
+        download_data()
+    vectorizer = HashingVectorizer(stop_words='english', n_features=n_buckets, alternate_sign=False)
+    clf = SGDClassifier(loss="log_loss", random_state=42)
+    classes = np.array([0, 1])
+
+    print(f"[{datetime.now()}] Streaming training from {data_path} ({chunk_rows} rows/chunk, {n_buckets} buckets)")
+    start = time.perf_counter()
+    trained = 0
+    for epoch in range(1, epochs + 1):
+        for number, texts, labels, holdout in _read_chunks(data_path, chunk_rows):
+            chunk_start = time.perf_counter()
+            X = vectorizer.transform(texts[~holdout])
+            y = labels[~holdout]
+            # Progressive validation: score the chunk before learning from it
+            seen = hasattr(clf, "coef_")
+            accuracy = float((clf.predict(X) == y).mean()) if seen and len(y) else float("nan")
+            clf.partial_fit(X, y, classes=classes)
+            trained += len(y)
+            elapsed = time.perf_counter() - chunk_start
+            print(f"[ML] epoch {epoch} chunk {number}: {len(y)} rows | {trained} total | "
+                  f"{len(y) / elapsed:,.0f} rows/s | pre-fit accuracy {accuracy:.4f} | peak RSS {_peak_rss_mb():.0f} MB")
+
+    # Second pass over the held-out rows, still one chunk at a time
+    correct = total = 0
+    for _, texts, labels, holdout in _read_chunks(data_path, chunk_rows):
+        if holdout.any():
+            correct += int((clf.predict(vectorizer.transform(texts[holdout])) == labels[holdout]).sum())
+            total += int(holdout.sum())
+    elapsed = time.perf_counter() - start
+    print(f"[ML] Trained on {trained} rows in {elapsed:.1f}s ({trained / elapsed:,.0f} rows/s), "
+          f"held-out accuracy {correct / max(total, 1):.4f} on {total} rows")
+
+    pipeline = Pipeline([('hashing', vectorizer), ('clf', clf)])
+    save_model(pipeline, path)
+    print(f"[ML] Model trained and saved → {path}")
     return pipeline
 
 
-# Auto-run on import (only trains once per process)
-pipeline = train_and_save_model()
\ No newline at end of file
+def compile_pipeline(pipeline) -> CompiledScorer:
+    # Flatten the fitted TF-IDF + LogisticRegression into a CompiledScorer.
+    # Refuses vectorizer settings the compiled scorer does not reproduce.
+    if "hashing" in pipeline.named_steps:
+        raise ValueError("Cannot compile pipeline: the hashing variant has no vocabulary to compile")
+    tfidf = pipeline.named_steps["tfidf"]
+    clf = pipeline.named_steps["clf"]
+
+    unsupported = {
+        "analyzer": tfidf.analyzer != "word",
+        "ngram_range": tuple(tfidf.ngram_range) != (1, 1),
+        "preprocessor": tfidf.preprocessor is not None,
+        "tokenizer": tfidf.tokenizer is not None,
+        "strip_accents": tfidf.strip_accents is not None,
+        "norm": tfidf.norm not in ("l2", "l1", None),
+        "classes": list(clf.classes_) != [0, 1],
+    }
+    problems = [name for name, bad in unsupported.items() if bad]
+    if problems:
+        raise ValueError(f"Cannot compile pipeline, unsupported settings: {problems}")
+
+    n_features = len(tfidf.vocabulary_)
+    idf = tfidf.idf_.astype(np.float64) if tfidf.use_idf else np.ones(n_features)
+    return CompiledScorer(
+        vocabulary={token: int(index) for token, index in tfidf.vocabulary_.items()},
+        idf=idf,
+        coef=clf.coef_[0].astype(np.float64),
+        intercept=clf.intercept_[0],
+        token_pattern=tfidf.token_pattern,
+        lowercase=tfidf.lowercase,
+        binary=tfidf.binary,
+        sublinear_tf=tfidf.sublinear_tf,
+        norm=tfidf.norm,
+    )
+
+
+def check_parity(pipeline, scorer, texts, atol: float = 1e-9) -> float:
+    # Compiled spam probabilities must match pipeline.predict_proba; returns the max difference
+    texts = list(texts) + PARITY_EDGE_CASES
+    expected = pipeline.predict_proba(texts)[:, 1]
+    actual = np.array([scorer.spam_probability(text) for text in texts])
+    diff = np.abs(expected - actual)
+    worst = int(diff.argmax())
+    if diff[worst] > atol:
+        raise ValueError(
+            f"Parity check failed: |delta p| = {diff[worst]:.3g} > {atol} for {texts[worst]!r}"
+        )
+    return float(diff[worst])
+
+
+def export_compiled_scorer(pipeline=None, path: str = COMPILED_PATH) -> CompiledScorer:
+    # Compile, verify against the real pipeline on every message we have, then save
+    if pipeline is None:
+        pipeline = joblib.load(MODEL_PATH)
+    scorer = compile_pipeline(pipeline)
+
+    download_data()
+    texts = pd.read_csv(DATA_PATH).text
+    max_delta = check_parity(pipeline, scorer, texts)
+    print(f"[ML] Compiled scorer matches the pipeline on {len(texts) + len(PARITY_EDGE_CASES)} texts (max |delta p| = {max_delta:.2e})")
+
+    save_model(scorer, path)
+    print(f"[ML] Compiled scorer saved → {path}")
+    return scorer
+
+
+def export_mmap_scorer(pipeline=None, path: str = MMAP_PATH) -> CompiledScorer:
+    # Same as export_compiled_scorer, but written as .npy arrays + JSON manifest (see CompiledScorer.save_mmap).
+    # The parity check runs on the reloaded, memory-mapped scorer, i.e. on exactly what workers will serve.
+    if pipeline is None:
+        pipeline = joblib.load(MODEL_PATH)
+    compile_pipeline(pipeline).save_mmap(path)
+    scorer = load_mmap_scorer(path)
+
+    download_data()
+    texts = pd.read_csv(DATA_PATH).text
+    max_delta = check_parity(pipeline, scorer, texts)
+    print(f"[ML] Memory-mapped scorer matches the pipeline on {len(texts) + len(PARITY_EDGE_CASES)} texts (max |delta p| = {max_delta:.2e})")
+    print(f"[ML] Memory-mapped scorer saved → {path}")
+    return scorer
+
+
+def load_mmap_scorer(path: str = MMAP_PATH) -> CompiledScorer:
+    # Maps the arrays read-only instead of unpickling them: loading is a few small reads,
+    # and every process serving the same artifact shares one page-cache copy
+    return CompiledScorer.load_mmap(path)
+
+
+def quantization_report(pipeline, scorers: dict, X_test, y_test) -> list:
+    # Accuracy of each scorer vs the float64 pipeline on the held-out split
+    expected = pipeline.predict_proba(X_test)[:, 1]
+    baseline = float(((expected > 0.5) == y_test.to_numpy()).mean())
+    rows = []
+    for name, scorer in scorers.items():
+        p = np.array([scorer.spam_probability(text) for text in X_test])
+        accuracy = float(((p > 0.5) == y_test.to_numpy()).mean())
+        rows.append({
+            "weights": name,
+            "bytes": int(scorer.idf.nbytes + scorer.coef.nbytes),
+            "accuracy": accuracy,
+            "accuracy_delta": accuracy - baseline,
+            "flipped": int(((p > 0.5) != (expected > 0.5)).sum()),
+            "max_delta_p": float(np.abs(p - expected).max()),
+        })
+
+    print(f"\n[ML] Quantization report on the held-out split ({len(X_test)} messages, float64 pipeline accuracy {baseline:.4f})")
+    print(f"{'weights':<8} {'idf+coef bytes':>14} {'accuracy':>9} {'delta':>8} {'flipped':>8} {'max |delta p|':>14}")
+    for row in rows:
+        print(f"{row['weights']:<8} {row['bytes']:>14} {row['accuracy']:>9.4f} {row['accuracy_delta']:>+8.4f} "
+              f"{row['flipped']:>8} {row['max_delta_p']:>14.2e}")
+    return rows
+
+
+def export_quantized_scorers(pipeline=None, dtypes=QUANTIZED_DTYPES, path: str = QUANTIZED_PATH) -> dict:
+    # Write one memory-mapped scorer per storage type next to the float64 artifact and
+    # report what quantization costs on the held-out split. No parity check here:
+    # the point is the (small) measured difference.
+    if pipeline is None:
+        pipeline = joblib.load(MODEL_PATH)
+    compiled = compile_pipeline(pipeline)
+
+    scorers = {"float64": compiled}
+    for dtype in dtypes:
+        target = path.format(dtype=dtype)
+        compiled.quantize(dtype).save_mmap(target)
+        scorers[dtype] = CompiledScorer.load_mmap(target)
+        print(f"[ML] {dtype} scorer saved → {target}")
+
+    _, X_test, _, y_test = load_split()
+    quantization_report(pipeline, scorers, X_test, y_test)
+    return scorers
+
+
+# Training is explicit now (importing this module no longer trains):
+#   python -m ml.trainer           # train only if ml/pipeline.pkl is missing
+#   python -m ml.trainer --force   # retrain and replace it
+#   python -m ml.trainer --export-compiled   # also write the compiled scorer (parity-checked)
+#   python -m ml.trainer --export-mmap       # also write the memory-mappable scorer (parity-checked)
+#   python -m ml.trainer --quantize int8     # also write quantized scorers + accuracy-delta report
+#   python -m ml.trainer --vectorizer hashing --buckets 65536   # stateless variant → ml/pipeline_hashing.pkl
+#   python -m ml.trainer --streaming --data big.csv --chunk-rows 100000   # out-of-core → ml/pipeline_streaming.pkl
+#   python -m ml.trainer --tune random --n-iter 30   # hyperparameter search, best pipeline → ml/pipeline.pkl
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the SMS spam detector")
+    parser.add_argument("--force", action="store_true", help="retrain even if the model file exists")
+    parser.add_argument("--export-compiled", action="store_true", help=f"write {COMPILED_PATH}")
+    parser.add_argument("--export-mmap", action="store_true", help=f"write {MMAP_PATH} and its arrays")
+    parser.add_argument("--quantize", nargs="+", choices=QUANTIZED_DTYPES, metavar="DTYPE",
+                        help=f"write quantized scorers ({', '.join(QUANTIZED_DTYPES)}) to {QUANTIZED_PATH}")
+    parser.add_argument("--vectorizer", choices=["tfidf", "hashing"], default="tfidf")
+    parser.add_argument("--buckets", type=int, default=HASH_BUCKETS, help="hash buckets for --vectorizer hashing")
+    parser.add_argument("--streaming", action="store_true", help=f"out-of-core SGD training → {STREAMING_MODEL_PATH}")
+    parser.add_argument("--data", default=DATA_PATH, help="CSV with label,text columns (--streaming)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--epochs", type=int, default=1)
+    parser.add_argument("--tune", choices=["grid", "random"], help="search hyperparameters and save the best pipeline")
+    parser.add_argument("--n-iter", type=int, default=20, help="candidates for --tune random")
+    parser.add_argument("--jobs", type=int, default=TUNE_JOBS, help="parallel fits for --tune (-1 = all cores)")
+    args = parser.parse_args()
+    if args.streaming:
+        train_streaming(args.data, chunk_rows=args.chunk_rows, n_buckets=args.buckets, epochs=args.epochs)
+    else:
+        if args.vectorizer == "hashing" and (args.export_compiled or args.export_mmap or args.quantize):
+            parser.error("--export-compiled/--export-mmap/--quantize need the tfidf vectorizer")
+        if args.tune:
+            pipeline = tune_model(args.tune, n_iter=args.n_iter, n_jobs=args.jobs)
+        else:
+            pipeline = train_and_save_model(force=args.force, vectorizer=args.vectorizer, n_buckets=args.buckets)
+        if args.export_compiled:
+            export_compiled_scorer(pipeline)
+        if args.export_mmap:
+            export_mmap_scorer(pipeline)
+        if args.quantize:
+            export_quantized_scorers(pipeline, args.quantize)
@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field
+from sqlalchemy import Index
 from typing import Optional
 from datetime import datetime
 
@@ -8,4 +9,18 @@ class Calculation(SQLModel, table=True):
     b: int
     result: int
     name: Optional[str] = None
-    timestamp: datetime = Field(default_factory=datetime.utcnow, index=True)
\ No newline at end of file
+    timestamp: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+
+# Matches the history order (newest first, id breaks ties) so keyset pages are index range scans
+Index(
+    "ix_calculation_timestamp_id_desc",
+    Calculation.__table__.c.timestamp.desc(),
+    Calculation.__table__.c.id.desc(),
+)
+
+class CalculationCounter(SQLModel, table=True):
+    # Single row (id=1) holding the number of rows in "calculation".
+    # Updated in the same transaction as every insert, so reading it is O(1).
+    id: int = Field(default=1, primary_key=True)
+    total: int = 0
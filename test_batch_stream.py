@@ -0,0 +1,40 @@
+import os
+import tempfile
+
+# Throwaway database, set before main creates its engine
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/test.db")
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+import main
+from database import engine
+
+
+def test_bad_line_is_422():
+    with TestClient(main.app) as client:
+        for bad in [b"notjson", b"\xff\xfe", b'{"a": 1}']:
+            response = client.post("/api/calc/add/batch/stream", content=b'{"a": 1, "b": 2}\n' + bad + b"\n")
+            assert response.status_code == 422, bad
+            assert response.json()["line"] == 2
+
+
+def test_batch_is_multi_row_insert():
+    statements = []
+
+    def count_inserts(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT INTO calculation "):
+            statements.append(statement)
+
+    rows = [{"a": i, "b": 1} for i in range(2500)]
+    event.listen(engine, "before_cursor_execute", count_inserts)
+    try:
+        with TestClient(main.app) as client:
+            response = client.post("/api/calc/add/batch", json=rows)
+    finally:
+        event.remove(engine, "before_cursor_execute", count_inserts)
+
+    assert response.status_code == 200
+    ids = response.json()["ids"]
+    assert len(ids) == 2500 and ids == sorted(ids)
+    assert len(statements) == -(-2500 // engine.dialect.insertmanyvalues_page_size)
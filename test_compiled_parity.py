@@ -0,0 +1,66 @@
+import os
+import tempfile
+
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+
+from ml.compiled import CompiledScorer
+from ml.trainer import build_pipeline, check_parity, compile_pipeline
+
+TEXTS = [
+    "WINNER!! You have won a FREE prize, call now to claim",
+    "Free entry in a weekly competition, text WIN to 80086",
+    "URGENT your mobile number has been awarded a cash bonus",
+    "Congratulations, claim your free holiday voucher today",
+    "Are we still on for lunch tomorrow?",
+    "I'll be home late, can you feed the cat",
+    "ok see you at the station at 6",
+    "Did you finish the report for Monday's meeting?",
+]
+LABELS = [1, 1, 1, 1, 0, 0, 0, 0]
+
+VECTORIZER_SETTINGS = {
+    "default": {},
+    "sublinear_tf": {"sublinear_tf": True},
+    "l1": {"norm": "l1"},
+    "no_norm": {"norm": None},
+    "binary": {"binary": True},
+    "no_idf": {"use_idf": False},
+    "case_sensitive": {"lowercase": False},
+}
+
+
+def fit_pipeline(**settings) -> Pipeline:
+    pipeline = Pipeline([
+        ('tfidf', TfidfVectorizer(**settings)),
+        ('clf', LogisticRegression(random_state=42, max_iter=1000)),
+    ])
+    return pipeline.fit(TEXTS, LABELS)
+
+
+@pytest.mark.parametrize("settings", VECTORIZER_SETTINGS.values(), ids=VECTORIZER_SETTINGS.keys())
+def test_compiled_matches_predict_proba(settings):
+    pipeline = fit_pipeline(**settings)
+    check_parity(pipeline, compile_pipeline(pipeline), TEXTS)
+
+
+@pytest.mark.parametrize("settings", VECTORIZER_SETTINGS.values(), ids=VECTORIZER_SETTINGS.keys())
+def test_mmap_round_trip_matches_predict_proba(settings):
+    pipeline = fit_pipeline(**settings)
+    with tempfile.TemporaryDirectory() as tmp:
+        manifest = os.path.join(tmp, "pipeline_mmap.json")
+        compile_pipeline(pipeline).save_mmap(manifest)
+        check_parity(pipeline, CompiledScorer.load_mmap(manifest), TEXTS)
+
+
+def test_refuses_ngrams():
+    with pytest.raises(ValueError, match="ngram_range"):
+        compile_pipeline(fit_pipeline(ngram_range=(1, 2)))
+
+
+def test_refuses_hashing_pipeline():
+    pipeline = build_pipeline("hashing", 2 ** 10).fit(TEXTS, LABELS)
+    with pytest.raises(ValueError, match="hashing"):
+        compile_pipeline(pipeline)
@@ -0,0 +1,22 @@
+import asyncio
+from typing import Any, List
+
+
+# Waits for the first item, then keeps taking items until max_items are collected
+# or max_wait seconds have passed since the first one arrived.
+# Used by every background consumer that works in groups (write-behind flusher,
+# spam micro-batcher, online learner).
+async def collect(queue: asyncio.Queue, max_items: int, max_wait: float) -> List[Any]:
+    loop = asyncio.get_running_loop()
+    items = [await queue.get()]
+    deadline = loop.time() + max_wait
+
+    while len(items) < max_items:
+        timeout = deadline - loop.time()
+        if timeout <= 0:
+            break
+        try:
+            items.append(await asyncio.wait_for(queue.get(), timeout))
+        except asyncio.TimeoutError:
+            break
+    return items
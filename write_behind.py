@@ -0,0 +1,87 @@
+import asyncio
+import os
+from typing import List, Optional, Tuple
+
+from calc_store import bump_count, insert_calculations
+from database import engine
+from utils.queue_utils import collect
+
+# "sync" = one commit per request (default), "write_behind" = queue + group commit
+WRITE_MODE = os.getenv("CALC_WRITE_MODE", "sync")
+
+# "group" = wait until our row is part of a committed group (we get the real id)
+# "none"  = return as soon as the row is queued (id is not known yet)
+DURABILITY = os.getenv("CALC_DURABILITY", "group")
+
+QUEUE_SIZE = int(os.getenv("CALC_QUEUE_SIZE", "10000"))  # max rows waiting in memory
+FLUSH_ROWS = int(os.getenv("CALC_FLUSH_ROWS", "500"))     # flush when a group has this many rows...
+FLUSH_MS = float(os.getenv("CALC_FLUSH_MS", "5"))         # ...or when the oldest row waited this long
+
+
+class WriteBehindQueue:
+    # Collects accepted calculations in a bounded queue and commits them in groups.
+    # One group = one transaction = one multi-row INSERT (insert_calculations; groups larger
+    # than the dialect's insertmanyvalues_page_size, 1000 rows, take one per page), so we
+    # pay one fsync and one statement per group instead of one each per request.
+    def __init__(self, max_size: int = QUEUE_SIZE, flush_rows: int = FLUSH_ROWS, flush_ms: float = FLUSH_MS):
+        self.max_size = max_size
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # Flush whatever is still queued, then stop the background flusher
+        if self._task is None:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        self._task = None
+
+    async def submit(self, row: dict, wait: bool = True) -> Optional[Tuple[int, int]]:
+        # Returns (id, history_count) once the row is committed, or None when not waiting
+        # Waits for free space when the queue is full (backpressure instead of dropping rows)
+        future = asyncio.get_running_loop().create_future() if wait else None
+        await self._queue.put((row, future))
+        if future is None:
+            return None
+        return await future
+
+    async def _run(self):
+        while True:
+            # Collect until the group is full or the time window is over
+            group = await collect(self._queue, self.flush_rows, self.flush_seconds)
+
+            try:
+                # The DB call is blocking, so run it in a worker thread
+                results = await asyncio.to_thread(self._flush, [row for row, _ in group])
+            except Exception as exc:
+                # Rows queued with durability "none" have nobody waiting, so always log it
+                print(f"[DB] Write-behind flush of {len(group)} rows failed: {exc}")
+                for _, future in group:
+                    if future is not None and not future.done():
+                        future.set_exception(exc)
+            else:
+                for (_, future), result in zip(group, results):
+                    if future is not None and not future.done():
+                        future.set_result(result)
+            finally:
+                for _ in group:
+                    self._queue.task_done()
+
+    @staticmethod
+    def _flush(rows: List[dict]) -> List[Tuple[int, int]]:
+        # Single transaction, one INSERT ... VALUES (...), (...) RETURNING id per page (ids in row order)
+        with engine.begin() as conn:
+            ids = insert_calculations(conn, rows)
+            total = bump_count(conn, len(ids))
+        # Row i of the group was the (total - len + i + 1)-th calculation ever saved
+        first = total - len(ids) + 1
+        return [(row_id, first + i) for i, row_id in enumerate(ids)]
+
+
+write_behind = WriteBehindQueue()